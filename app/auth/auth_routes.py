@@ -1,6 +1,7 @@
 import urllib.parse
 import secrets
-from fastapi import APIRouter, status, Response, Form, Request
+import logging
+from fastapi import APIRouter, BackgroundTasks, status, Response, Form, Request
 from fastapi.responses import RedirectResponse
 from .auth_models import (
     CreateUserModel,
@@ -10,16 +11,24 @@ from .auth_models import (
     UpdateUserPassword,
 )
 from typing import Annotated
+from bson import ObjectId
 from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from datetime import timedelta, datetime, timezone
 
 from .auth_dto import LoginUserDto
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.password_hashing import password_hasher
+from app.core.rate_limit import check_login_rate
+from app.core.security import create_access_token
+from app.core.user_cache import user_cache
 from app.core.utils import Message, collection_error_msg, HTTPMessageException
 from app.core import settings
-from app.core.mailing import generate_password_reset_email, send_email
+from app.core.deps import TokenFromCookieDep
+from app.core.mailing import generate_password_reset_email, send_email_async
 
-from app.core import get_collection, MONGO_COLLECTIONS
+from app.core import get_async_collection, MONGO_COLLECTIONS
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth")
 
@@ -30,12 +39,12 @@ router = APIRouter(prefix="/auth")
     status_code=status.HTTP_201_CREATED,
     response_model=Message,
 )
-def create_user(user_dto: CreateUserModel):
+async def create_user(user_dto: CreateUserModel):
     """
     Create a new User
     """
 
-    user_collection = get_collection(MONGO_COLLECTIONS.USERS)
+    user_collection = get_async_collection(MONGO_COLLECTIONS.USERS)
     if user_collection is None:
         raise HTTPMessageException(
             status_code=500,
@@ -44,17 +53,30 @@ def create_user(user_dto: CreateUserModel):
             json_res=True,
         )
 
-    if (user_exist := user_collection.find_one({"email": user_dto.email})) is not None:
+    if (
+        user_exist := await user_collection.find_one({"email": user_dto.email})
+    ) is not None:
         raise HTTPMessageException(
             status_code=400,
             message=f"User with email {user_exist["email"]} already exists in the system",
             success=False,
             json_res=True,
         )
-    user_dto.hashed_password = get_password_hash(user_dto.hashed_password)
+    # bcrypt is CPU bound, it runs in the password hashing process pool
+    user_dto.hashed_password = await password_hasher.hash(user_dto.hashed_password)
     user = UserModel(**user_dto.model_dump())
-    result = user_collection.insert_one(user.model_dump(by_alias=True, exclude=["id"]))
-    new_user = user_collection.find_one({"_id": result.inserted_id})
+    try:
+        result = await user_collection.insert_one(
+            user.model_dump(by_alias=True, exclude=["id"])
+        )
+    except DuplicateKeyError:
+        raise HTTPMessageException(
+            status_code=400,
+            message=f"User with email {user.email} already exists in the system",
+            success=False,
+            json_res=True,
+        )
+    new_user = await user_collection.find_one({"_id": result.inserted_id})
     return Message(
         status_code=status.HTTP_201_CREATED,
         message="User created successfully",
@@ -69,8 +91,16 @@ def create_user(user_dto: CreateUserModel):
     status_code=status.HTTP_200_OK,
     response_model=Message,
 )
-def login(response: Response, login_dto: LoginUserDto):
-    user_collection = get_collection(MONGO_COLLECTIONS.USERS)
+async def login(
+    request: Request,
+    response: Response,
+    login_dto: LoginUserDto,
+    background_tasks: BackgroundTasks,
+):
+    # before any lookup or hashing, a credential stuffing burst must not tie up bcrypt
+    await check_login_rate(request, login_dto.email)
+
+    user_collection = get_async_collection(MONGO_COLLECTIONS.USERS)
     if user_collection is None:
         raise HTTPMessageException(
             status_code=500,
@@ -78,7 +108,7 @@ def login(response: Response, login_dto: LoginUserDto):
             success=False,
             json_res=True,
         )
-    if (user := user_collection.find_one({"email": login_dto.email})) is None:
+    if (user := await user_collection.find_one({"email": login_dto.email})) is None:
         raise HTTPMessageException(
             status_code=404,
             message=f"user with email: {login_dto.email} does not exist in the system",
@@ -86,10 +116,15 @@ def login(response: Response, login_dto: LoginUserDto):
             json_res=True,
         )
     user = UserModel(**user)
-    if not verify_password(login_dto.password, user.hashed_password):
+    if not await password_hasher.verify(login_dto.password, user.hashed_password):
         raise HTTPMessageException(
             status_code=400, message="Invalid credentials", success=False, json_res=True
         )
+    if password_hasher.needs_update(user.hashed_password):
+        # hashed with a lower bcrypt cost than the current one
+        background_tasks.add_task(
+            rehash_password, user.id, user.hashed_password, login_dto.password
+        )
     user = PublicUserModel(**user.model_dump())
     user = user.model_dump()
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -107,11 +142,25 @@ def login(response: Response, login_dto: LoginUserDto):
     )
 
 
+async def rehash_password(user_id: str, hashed_password: str, password: str) -> None:
+    try:
+        new_hashed_password = await password_hasher.hash(password)
+    except HTTPMessageException:
+        # the pool is busy, the next login tries again
+        return
+    # skipped if the password was changed in the meantime
+    await get_async_collection(MONGO_COLLECTIONS.USERS).update_one(
+        {"_id": ObjectId(user_id), "hashed_password": hashed_password},
+        {"$set": {"hashed_password": new_hashed_password}},
+    )
+    logger.info(f"rehashed the password of user {user_id}")
+
+
 @router.post("/send-password-reset-email", name="send_password_reset_email")
-def send_password_reset_email(
+async def send_password_reset_email(
     request: Request, user_email: Annotated[UpdateUserEmail, Form()]
 ):
-    user_collection = get_collection(MONGO_COLLECTIONS.USERS)
+    user_collection = get_async_collection(MONGO_COLLECTIONS.USERS)
     if user_collection is None:
         raise HTTPMessageException(
             status_code=500,
@@ -121,12 +170,12 @@ def send_password_reset_email(
             success=False,
         )
 
-    if (user := user_collection.find_one({"email": user_email.email})) is None:
+    if (user := await user_collection.find_one({"email": user_email.email})) is None:
         raise HTTPMessageException(status_code=404, message="user does not exist")
 
     reset_code = f"reset_{secrets.token_urlsafe(20)}"
 
-    user_collection.find_one_and_update(
+    await user_collection.find_one_and_update(
         {"_id": user["_id"]},
         {"$set": {"password_reset_key": reset_code}},
         return_document=ReturnDocument.AFTER,
@@ -143,7 +192,7 @@ def send_password_reset_email(
     try:
         email_data = generate_password_reset_email(password_reset_link=reset_url)
 
-        send_email(
+        await send_email_async(
             email_to=user_email.email,
             subject=email_data.subject,
             html_content=email_data.html_content,
@@ -165,11 +214,11 @@ def send_password_reset_email(
 
 
 @router.post("/update-password", name="update_user_password")
-def update_user_password(
+async def update_user_password(
     request: Request,
     user_password: Annotated[UpdateUserPassword, Form()],
 ):
-    user_collection = get_collection(MONGO_COLLECTIONS.USERS)
+    user_collection = get_async_collection(MONGO_COLLECTIONS.USERS)
     if user_collection is None:
         raise HTTPMessageException(
             status_code=500,
@@ -179,10 +228,16 @@ def update_user_password(
             success=False,
         )
 
-    hashed_password = get_password_hash(user_password.password)
+    hashed_password = await password_hasher.hash(user_password.password, json_res=False)
 
-    user_with_code = user_collection.find_one_and_update(
-        {"password_reset_key": user_password.reset_code},
+    user_with_code = await user_collection.find_one_and_update(
+        # `$type` lets the planner use the partial `password_reset_key_partial` index
+        {
+            "password_reset_key": {
+                "$eq": user_password.reset_code,
+                "$type": "string",
+            }
+        },
         {"$set": {"password_reset_key": None, "hashed_password": hashed_password}},
         return_document=ReturnDocument.AFTER,
     )
@@ -192,6 +247,7 @@ def update_user_password(
             message="User with this reset code does not exist",
             status_code=status.HTTP_404_NOT_FOUND,
         )
+    user_cache.invalidate_user(str(user_with_code["_id"]))
 
     reseponse = RedirectResponse(
         status_code=status.HTTP_302_FOUND, url=request.url_for("auth")
@@ -201,7 +257,9 @@ def update_user_password(
 
 
 @router.get("/logout", name="logout")
-def logout(request: Request):
+async def logout(request: Request, tk: TokenFromCookieDep = None):
+    if tk is not None:
+        user_cache.invalidate_token(tk)
     reseponse = RedirectResponse(
         status_code=status.HTTP_302_FOUND, url=request.url_for("auth")
     )
@@ -1,6 +1,12 @@
 from .template_manager import templates
 from .config import settings
 
-from .db import get_collection, MONGO_COLLECTIONS
+from .db import get_collection, get_async_collection, MONGO_COLLECTIONS
 
-__all__ = ("templates", "settings", "get_collection", "MONGO_COLLECTIONS")
+__all__ = (
+    "templates",
+    "settings",
+    "get_collection",
+    "get_async_collection",
+    "MONGO_COLLECTIONS",
+)
@@ -14,6 +14,8 @@ from datetime import datetime
 from typing import Dict
 
 from app.core.config import settings
+from app.core.metrics import observe_external
+from app.core.qr_render import render_qrcode
 
 
 class CloudinaryResponse(BaseModel):
@@ -67,7 +69,7 @@ def image_to_bytes(image) -> bytes:
     """
     accepts an image object and returns image bytes
 
-    More performant than using `image`.`tobytes()`
+    The PNG is a fraction of the size of the raw pixels `image`.`tobytes()` returns, at the cost of compressing them (see `benchmarks.qr_pipeline`)
     """
     # create I/O byte buffer
     img_byte = io.BytesIO()
@@ -91,9 +93,13 @@ def uploadImage(imageBytes: bytes) -> CloudinaryResponse:
     """
     uploads the image to cloudinary returning a `CloudinaryResponse` object
     """
-    cloudinary_res = cloudinary.uploader.upload(
-        imageBytes, unique_filename=True, overwrite=True, folder="qrcode_event_manager"
-    )
+    with observe_external("cloudinary", "upload"):
+        cloudinary_res = cloudinary.uploader.upload(
+            imageBytes,
+            unique_filename=True,
+            overwrite=True,
+            folder="qrcode_event_manager",
+        )
     return CloudinaryResponse(**cloudinary_res)
 
 
@@ -101,11 +107,10 @@ def create_n_upload_qrcode(content: str) -> CloudinaryResponse:
     """
     this function performs the following functionality, in order:
     - accepts a string
-    - embeds the string into a QR code image object (in memory)
+    - renders the string as a QR code image (in memory, see `app.core.qr_render`)
     - stores the QR code image on cloudinary and returns a `CloudinaryResponse`
     """
-    img_obj = make_qrcode_with_content(content)
-    img_bytes = image_to_bytes(img_obj)
+    img_bytes = render_qrcode(content)
     return uploadImage(img_bytes)
 
 
@@ -113,7 +118,8 @@ def deleteImage(public_id: str) -> Dict[str, str]:
     """
     deletes an image from cloudinary using the image public id
     """
-    response = cloudinary.uploader.destroy(public_id)
+    with observe_external("cloudinary", "destroy"):
+        response = cloudinary.uploader.destroy(public_id)
     # e.g {'result': 'ok'}
     return response
 
@@ -1,3 +1,4 @@
+import os
 import secrets
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import (
@@ -33,11 +34,24 @@ class Settings(BaseSettings):
     DEBUG: bool
 
     DATABASE_NAME: str
+    # create missing indexes (see `app/core/indexes.py`) when the app starts
+    MONGO_ENSURE_INDEXES: bool = True
 
     CLOUDINARY_CLOUD_NAME: str
     CLOUDINARY_API_KEY: int
     CLOUDINARY_API_SECRET: str
 
+    # invite QR codes (see `app/core/qr_render.py`), most mail clients do not display svg images
+    QR_IMAGE_FORMAT: Literal["png", "svg"] = "png"
+    QR_BOX_SIZE: int = 10
+    QR_BORDER: int = 4
+    QR_ERROR_CORRECTION: Literal["L", "M", "Q", "H"] = "L"
+    # a fixed mask (0-7) skips scoring every mask, the codes stay valid but may scan slightly less reliably
+    QR_MASK_PATTERN: int | None = Field(default=None, ge=0, le=7)
+    # `local` renders QR codes on demand instead of uploading them (see `app/core/qr_storage.py`)
+    QR_STORAGE_BACKEND: Literal["cloudinary", "local"] = "cloudinary"
+    QR_IMAGE_CACHE_MAXSIZE: int = 1024
+
     SMTP_USER_EMAIL: EmailStr
     SMTP_PASSWORD: str
     SMTP_HOST: str = "smtp.gmail.com"
@@ -46,15 +60,77 @@ class Settings(BaseSettings):
     SMTP_SSL: bool = False
     EMAILS_FROM_EMAIL: str | None = None
     EMAILS_FROM_NAME: str | None = None
+    # connections are kept open and shared by every mail sent from this process
+    SMTP_POOL_SIZE: int = 4
+    SMTP_POOL_TIMEOUT_SECONDS: float = 30
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    # idle connections are checked with `NOOP` before they are reused
+    SMTP_KEEPALIVE_SECONDS: float = 30
+    SMTP_TIMEOUT_SECONDS: float = 10
 
     @computed_field  # type: ignore[prop-decorator]
     @property
     def emails_enabled(self) -> bool:
         return bool(self.SMTP_HOST and self.EMAILS_FROM_EMAIL)
 
+    # events and guest listings, `limit` query parameter
+    LIST_PAGE_SIZE: int = 50
+    LIST_MAX_PAGE_SIZE: int = 500
+    # invites fetched per round trip by the guest list export
+    EXPORT_BATCH_SIZE: int = 1000
+    # recompute the per event guest counters (see `app/events/event_stats.py`), `None` only runs it by hand
+    EVENT_STATS_RECONCILE_INTERVAL_SECONDS: float | None = None
+    # events with invite writes this recent are not repaired yet, their increments may be on the way
+    EVENT_STATS_RECONCILE_GRACE_SECONDS: float = 60
+    # live attendance totals re-read from the event counters (see `app/events/attendance.py`), they then count the check-ins of every worker, `None` only counts the local ones
+    ATTENDANCE_REFRESH_INTERVAL_SECONDS: float | None = 10
+
+    # guest list (CSV) imports
+    BULK_IMPORT_BATCH_SIZE: int = 500
+    BULK_IMPORT_MAX_ROWS: int = 10_000
+
+    # background invitation delivery (QR code upload + invitation email)
+    INVITE_DELIVERY_WORKERS: int = 8
+    INVITE_DELIVERY_MAX_ATTEMPTS: int = 5
+    INVITE_DELIVERY_BACKOFF_SECONDS: float = 30
+    INVITE_DELIVERY_MAX_BACKOFF_SECONDS: float = 60 * 60
+    INVITE_DELIVERY_POLL_INTERVAL_SECONDS: float = 5
+    # a claimed invite is handed to another worker if it is not finished within the lease
+    INVITE_DELIVERY_LEASE_SECONDS: float = 5 * 60
+    INVITE_DELIVERY_SHUTDOWN_TIMEOUT_SECONDS: float = 30
+
+    # set it in production: the default is random per process, tokens and invite codes signed with it do not survive a restart nor work across workers (invite codes are then created unsigned)
     SECRET_KEY: str = Field(default_factory=lambda: secrets.token_urlsafe(32))
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # unsigned `INVITE_...` codes (see `app/core/invite_codes.py`), turn off once no pending invites use them
+    ACCEPT_LEGACY_INVITE_CODES: bool = True
+    # bcrypt runs in a process pool (see `app/core/password_hashing.py`), calls beyond `workers + max queue` get a 503
+    PASSWORD_HASH_WORKERS: int = Field(
+        default_factory=lambda: max(1, (os.cpu_count() or 2) // 2)
+    )
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    # `None` tunes the cost on startup so a hash takes about `BCRYPT_TARGET_SECONDS`
+    BCRYPT_ROUNDS: int | None = Field(default=None, ge=4, le=31)
+    BCRYPT_TARGET_SECONDS: float = 0.25
+    BCRYPT_MIN_ROUNDS: int = 10
+    BCRYPT_MAX_ROUNDS: int = 16
+    # login attempts per client address and per email (see `app/core/rate_limit.py`), `mongo` shares the counters between app processes
+    RATE_LIMIT_BACKEND: Literal["memory", "mongo"] = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: float = 60
+    LOGIN_RATE_LIMIT_PER_IP: int = 30
+    LOGIN_RATE_LIMIT_PER_EMAIL: int = 10
+    # `/metrics` requires `Authorization: Bearer {METRICS_TOKEN}` when set
+    METRICS_TOKEN: str | None = None
+    # authenticated users are cached per (user id, token) by `get_current_user`
+    USER_CACHE_TTL_SECONDS: float = 60
+    USER_CACHE_MAXSIZE: int = 10_000
+    # rendered events listing and event pages (see `app/core/page_cache.py`), the size counts the page bodies
+    PAGE_CACHE_TTL_SECONDS: float = 60
+    # where the page versions live, with several uvicorn workers `memory` sees the writes of another worker once the page expires, `mongo` at once but costs a query per hit
+    PAGE_CACHE_BACKEND: Literal["memory", "mongo"] = "memory"
+    PAGE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
     # FRONTEND_HOST: str = "http://localhost:5173"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
@@ -1,6 +1,8 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.asynchronous.collection import AsyncCollection
 from pymongo.collection import Collection
 from app.core import settings
+from app.core.metrics import MongoCommandMetrics
 from urllib.parse import quote_plus
 from enum import Enum
 from typing import Union
@@ -12,14 +14,21 @@ uri = "%s://%s:%s@%s" % (
     settings.MONGO_HOST,
 )
 
-client = MongoClient(uri)
+# blocking client, used off the event loop (background workers, CLI commands)
+client = MongoClient(uri, event_listeners=[MongoCommandMetrics()])
 db = client[settings.DATABASE_NAME]
 
+# used by the (async) route handlers
+async_client = AsyncMongoClient(uri, event_listeners=[MongoCommandMetrics()])
+async_db = async_client[settings.DATABASE_NAME]
+
 
 class MONGO_COLLECTIONS(Enum):
     EVENTS = "events"
     USERS = "users"
     INVITE = "invites"
+    RATE_LIMITS = "rate_limits"
+    PAGE_VERSIONS = "page_versions"
 
 
 def get_collection(collection_name: MONGO_COLLECTIONS) -> Union[Collection, None]:
@@ -36,3 +45,14 @@ def get_collection(collection_name: MONGO_COLLECTIONS) -> Union[Collection, None
     except ArithmeticError as e:
         print(f"ArithmeticError: {e}")
         return None
+
+
+def get_async_collection(
+    collection_name: MONGO_COLLECTIONS,
+) -> Union[AsyncCollection, None]:
+    try:
+        coll_name = collection_name.value
+        return async_db[coll_name]
+    except AttributeError as e:
+        print(f"AttributeError: {e}")
+        return None
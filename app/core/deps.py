@@ -6,14 +6,15 @@ import jwt
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
 
-from . import settings, security, get_collection, MONGO_COLLECTIONS
+from . import settings, security, get_async_collection, MONGO_COLLECTIONS
 from .utils import HTTPMessageException, TokenPayload, collection_error_msg
+from .user_cache import user_cache
 from app.auth.auth_models import UserModel
 
 TokenFromCookieDep = Annotated[Union[str, None], Cookie()]
 
 
-def is_user_authenticated(
+async def is_user_authenticated(
     request: Request, tk: TokenFromCookieDep = None
 ) -> RedirectResponse | None:
     if tk is not None:
@@ -33,7 +34,7 @@ IsUserAuthenticatedDeps = Annotated[
 ]
 
 
-def get_current_user(tk: TokenFromCookieDep = None) -> UserModel:
+async def get_current_user(tk: TokenFromCookieDep = None) -> UserModel:
     if tk is None:
         raise HTTPMessageException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -50,7 +51,10 @@ def get_current_user(tk: TokenFromCookieDep = None) -> UserModel:
             success=False,
         )
 
-    users_collection = get_collection(MONGO_COLLECTIONS.USERS)
+    if (user := user_cache.get(token_data.sub, tk)) is not None:
+        return user
+
+    users_collection = get_async_collection(MONGO_COLLECTIONS.USERS)
     if users_collection is None:
         raise HTTPMessageException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -59,7 +63,9 @@ def get_current_user(tk: TokenFromCookieDep = None) -> UserModel:
             ),
             success=False,
         )
-    if (user := users_collection.find_one({"_id": ObjectId(token_data.sub)})) is None:
+    if (
+        user := await users_collection.find_one({"_id": ObjectId(token_data.sub)})
+    ) is None:
         raise HTTPMessageException(
             message="User does not exist in the system",
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,6 +78,8 @@ def get_current_user(tk: TokenFromCookieDep = None) -> UserModel:
             status_code=status.HTTP_400_BAD_REQUEST,
             success=False,
         )
+    # only active users are cached, deactivating a user must call `user_cache.invalidate_user`
+    user_cache.set(token_data.sub, tk, user)
     return user
 
 
@@ -0,0 +1,216 @@
+"""
+    Declarative MongoDB index registry.
+
+    `INDEXES` lists the indexes every collection should have, `ensure_indexes` drops the `RETIRED_INDEXES` and creates the missing ones (creating an existing index is a no-op) and runs on startup. It can also be run by hand:
+
+    - `python -m app.core.indexes apply` creates missing indexes
+    - `python -m app.core.indexes status` lists declared indexes and whether they exist or are still building
+    - `python -m app.core.indexes usage` prints `$indexStats` usage counters
+"""
+
+import argparse
+import json
+import logging
+from typing import Any
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.core.db import client, get_collection, MONGO_COLLECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+INDEXES: dict[MONGO_COLLECTIONS, list[IndexModel]] = {
+    MONGO_COLLECTIONS.INVITE: [
+        # `verify_invite_code`
+        IndexModel([("code", ASCENDING)], name="code_unique", unique=True),
+        # guest listing of an event, also rejects inviting the same guest twice
+        IndexModel(
+            [("event_invited_to", ASCENDING), ("email", ASCENDING)],
+            name="event_invited_to_email_unique",
+            unique=True,
+        ),
+        # paginated guest listing of an event, with and without the accepted/pending filter
+        IndexModel(
+            [("event_invited_to", ASCENDING), ("_id", ASCENDING)],
+            name="event_invited_to_id",
+        ),
+        IndexModel(
+            [
+                ("event_invited_to", ASCENDING),
+                ("invite_accepted", ASCENDING),
+                ("_id", ASCENDING),
+            ],
+            name="event_invited_to_invite_accepted_id",
+        ),
+        # deltas of the offline check-in sync
+        IndexModel(
+            [("event_invited_to", ASCENDING), ("created_at", ASCENDING)],
+            name="event_invited_to_created_at",
+        ),
+        IndexModel(
+            [("event_invited_to", ASCENDING), ("updated_at", ASCENDING)],
+            name="event_invited_to_updated_at",
+        ),
+        # delivery queue claims in `invite_delivery`
+        IndexModel(
+            [("delivery_status", ASCENDING), ("next_attempt_at", ASCENDING)],
+            name="delivery_status_next_attempt_at",
+        ),
+    ],
+    MONGO_COLLECTIONS.USERS: [
+        # `login`, `create_user`, `send_password_reset_email`
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # `update_user_password`
+        # only users with a pending reset hold a string, the cleared `None` keys stay out of the index
+        IndexModel(
+            [("password_reset_key", ASCENDING)],
+            name="password_reset_key_partial",
+            partialFilterExpression={"password_reset_key": {"$type": "string"}},
+        ),
+    ],
+    MONGO_COLLECTIONS.EVENTS: [
+        # paginated `get_events_page`
+        IndexModel(
+            [("created_by", ASCENDING), ("_id", ASCENDING)], name="created_by_id"
+        ),
+    ],
+    MONGO_COLLECTIONS.RATE_LIMITS: [
+        # window counters of the `mongo` rate limit backend are removed once over
+        IndexModel(
+            [("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0
+        ),
+    ],
+    MONGO_COLLECTIONS.PAGE_VERSIONS: [
+        # scope versions of the `mongo` page cache backend outlive the pages they invalidate, then go
+        IndexModel(
+            [("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0
+        ),
+    ],
+}
+
+# replaced indexes, dropped by `ensure_indexes` (an index over the same keys with other options cannot be created next to them)
+RETIRED_INDEXES: dict[MONGO_COLLECTIONS, list[str]] = {
+    # `sparse` kept every user whose key was reset to `None`
+    MONGO_COLLECTIONS.USERS: ["password_reset_key_sparse"],
+}
+
+
+def drop_retired_indexes() -> None:
+    for collection_name, names in RETIRED_INDEXES.items():
+        collection = get_collection(collection_name)
+        existing = {index["name"] for index in collection.list_indexes()}
+        for name in existing.intersection(names):
+            logger.info(f"dropping retired index {name} on {collection_name.value}")
+            collection.drop_index(name)
+
+
+def ensure_indexes() -> list[dict[str, Any]]:
+    """
+    creates every declared index that does not exist yet, an index that fails to build (e.g. a unique index over duplicated data) is reported and skipped
+    """
+    results = []
+    try:
+        drop_retired_indexes()
+    except OperationFailure as exc:
+        logger.error(f"failed to drop retired indexes: {exc}")
+    for collection_name, indexes in INDEXES.items():
+        collection = get_collection(collection_name)
+        for index in indexes:
+            name = index.document["name"]
+            try:
+                collection.create_indexes([index])
+                results.append(
+                    {"collection": collection_name.value, "index": name, "ok": True}
+                )
+            except OperationFailure as exc:
+                logger.error(
+                    f"failed to create index {name} on {collection_name.value}: {exc}"
+                )
+                results.append(
+                    {
+                        "collection": collection_name.value,
+                        "index": name,
+                        "ok": False,
+                        "error": str(exc),
+                    }
+                )
+    return results
+
+
+def _index_builds() -> dict[tuple[str, str], str]:
+    """
+    progress message of index builds in progress, keyed by `(collection, index name)`
+    """
+    builds = {}
+    try:
+        operations = client.admin.aggregate(
+            [
+                {"$currentOp": {"allUsers": True, "idleConnections": False}},
+                {"$match": {"command.createIndexes": {"$exists": True}}},
+            ]
+        )
+        for operation in operations:
+            command = operation["command"]
+            progress = operation.get("msg", "building")
+            for index in command.get("indexes", []):
+                builds[(command["createIndexes"], index.get("name"))] = progress
+    except OperationFailure as exc:
+        # `$currentOp` needs the `inprog` privilege
+        logger.warning(f"index builds are not visible: {exc}")
+    return builds
+
+
+def index_status() -> list[dict[str, Any]]:
+    """
+    state of every declared index: `ready`, `building` or `missing`
+    """
+    builds = _index_builds()
+    status = []
+    for collection_name, indexes in INDEXES.items():
+        existing = {
+            index["name"] for index in get_collection(collection_name).list_indexes()
+        }
+        for index in indexes:
+            name = index.document["name"]
+            state = {"collection": collection_name.value, "index": name}
+            if (build := builds.get((collection_name.value, name))) is not None:
+                state.update(state="building", progress=build)
+            elif name in existing:
+                state["state"] = "ready"
+            else:
+                state["state"] = "missing"
+            status.append(state)
+    return status
+
+
+def index_usage() -> list[dict[str, Any]]:
+    """
+    number of operations that used each index since `since` (the last server restart or index rebuild)
+    """
+    usage = []
+    for collection_name in MONGO_COLLECTIONS:
+        for stats in get_collection(collection_name).aggregate([{"$indexStats": {}}]):
+            usage.append(
+                {
+                    "collection": collection_name.value,
+                    "index": stats["name"],
+                    "ops": stats["accesses"]["ops"],
+                    "since": stats["accesses"]["since"],
+                }
+            )
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="manage MongoDB indexes")
+    parser.add_argument("command", choices=("apply", "status", "usage"))
+    args = parser.parse_args()
+
+    commands = {"apply": ensure_indexes, "status": index_status, "usage": index_usage}
+    print(json.dumps(commands[args.command](), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
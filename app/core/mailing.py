@@ -1,13 +1,21 @@
+import asyncio
 import logging
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
 import emails
-from jinja2 import Template
+from emails.backend import SMTPBackend
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
 from app.core.config import settings
+from app.core.metrics import observe_external
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,14 +27,165 @@ class EmailData:
     subject: str
 
 
+# templates are compiled once per process, the bytecode cache also spares new processes the compilation.
+# in DEBUG the template files are checked for changes on every render
+mail_templates = Environment(
+    loader=FileSystemLoader(Path(__file__).parent.parent.parent / "templates" / "mail"),
+    bytecode_cache=FileSystemBytecodeCache(),
+    auto_reload=settings.DEBUG,
+)
+
+
+def reload_email_templates() -> None:
+    """
+    drops every compiled mail template, they are loaded again on their next render
+    """
+    mail_templates.cache.clear()
+
+
 def render_email_template(*, template_name: str, context: dict[str, Any]) -> str:
-    template_str = (
-        Path(__file__).parent.parent.parent / "templates" / "mail" / template_name
-    ).read_text()
-    html_content = Template(template_str).render(context)
+    html_content = mail_templates.get_template(template_name).render(context)
     return html_content
 
 
+class SMTPPoolTimeout(Exception):
+    def __init__(self, message: str = "no SMTP connection became available"):
+        self.message = message
+        super().__init__(message)
+
+
+class PooledSMTPConnection(SMTPBackend):
+    """
+    an `emails` SMTP backend that keeps its connection open between messages
+    """
+
+    def __init__(self, **smtp_options):
+        super().__init__(fail_silently=False, **smtp_options)
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+        self.broken = False
+
+    def is_alive(self) -> bool:
+        if self._client is None:
+            return True
+        try:
+            code, _ = self._client.noop()
+        except (smtplib.SMTPException, OSError):
+            code = None
+        return code == 250
+
+
+class SMTPConnectionPool:
+    """
+    a bounded pool of persistent SMTP connections
+
+    - at most `size` connections are open, callers wait up to `timeout` seconds for a free one
+    - connections idle for longer than `keepalive` seconds are checked with `NOOP` and replaced when dead
+    - a connection is closed after `max_messages` messages, some servers drop long lived sessions
+    - a send that fails on a reused connection is retried once on a fresh one
+    """
+
+    def __init__(
+        self,
+        *,
+        size: int,
+        max_messages: int,
+        keepalive: float,
+        timeout: float,
+    ):
+        self.size = size
+        self.max_messages = max_messages
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        # LIFO so the most recently used (warm) connection is reused first
+        self._idle: queue.LifoQueue[PooledSMTPConnection] = queue.LifoQueue()
+
+    @staticmethod
+    def smtp_options() -> dict[str, Any]:
+        smtp_options = {
+            "host": settings.SMTP_HOST,
+            "port": settings.SMTP_PORT,
+            "timeout": settings.SMTP_TIMEOUT_SECONDS,
+        }
+        if settings.SMTP_TLS:
+            smtp_options["tls"] = True
+        elif settings.SMTP_SSL:
+            smtp_options["ssl"] = True
+        if settings.SMTP_USER_EMAIL:
+            smtp_options["user"] = settings.SMTP_USER_EMAIL
+        if settings.SMTP_PASSWORD:
+            smtp_options["password"] = settings.SMTP_PASSWORD
+        return smtp_options
+
+    def _checkout(self) -> PooledSMTPConnection:
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return PooledSMTPConnection(**self.smtp_options())
+            if time.monotonic() - connection.last_used < self.keepalive:
+                return connection
+            if connection.is_alive():
+                return connection
+            connection.close()
+
+    def _checkin(self, connection: PooledSMTPConnection) -> None:
+        connection.last_used = time.monotonic()
+        if connection.broken or connection.messages_sent >= self.max_messages:
+            connection.close()
+            return
+        self._idle.put(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledSMTPConnection]:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise SMTPPoolTimeout()
+        try:
+            connection = self._checkout()
+            try:
+                yield connection
+            except BaseException:
+                connection.broken = True
+                raise
+            finally:
+                self._checkin(connection)
+        finally:
+            self._slots.release()
+
+    def send(self, message: emails.Message, email_to: str):
+        for attempt in (1, 2):
+            with self.connection() as connection:
+                reused = connection.messages_sent > 0
+                try:
+                    with observe_external("smtp", "send"):
+                        response = message.send(to=email_to, smtp=connection)
+                except (smtplib.SMTPException, OSError) as exc:
+                    connection.broken = True
+                    # a stale connection gets one more try on a fresh connection
+                    if attempt == 1 and reused:
+                        logger.info(f"retrying mail on a new SMTP connection: {exc}")
+                        continue
+                    raise
+                connection.messages_sent += 1
+                return response
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+smtp_pool = SMTPConnectionPool(
+    size=settings.SMTP_POOL_SIZE,
+    max_messages=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+    keepalive=settings.SMTP_KEEPALIVE_SECONDS,
+    timeout=settings.SMTP_POOL_TIMEOUT_SECONDS,
+)
+
+
 def send_email(
     *,
     email_to: str,
@@ -39,19 +198,21 @@ def send_email(
         html=html_content,
         mail_from=(settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL),
     )
-    smtp_options = {"host": settings.SMTP_HOST, "port": settings.SMTP_PORT}
-    if settings.SMTP_TLS:
-        smtp_options["tls"] = True
-    elif settings.SMTP_SSL:
-        smtp_options["ssl"] = True
-    if settings.SMTP_USER_EMAIL:
-        smtp_options["user"] = settings.SMTP_USER_EMAIL
-    if settings.SMTP_PASSWORD:
-        smtp_options["password"] = settings.SMTP_PASSWORD
-    response = message.send(to=email_to, smtp=smtp_options)
+    response = smtp_pool.send(message, email_to)
     logger.info(f"send email result: {response}")
 
 
+async def send_email_async(
+    *,
+    email_to: str,
+    subject: str = "",
+    html_content: str = "",
+) -> None:
+    await asyncio.to_thread(
+        send_email, email_to=email_to, subject=subject, html_content=html_content
+    )
+
+
 def generate_event_invitation_email(
     *,
     fullname: str,
@@ -0,0 +1,310 @@
+"""
+    Prometheus metrics, served by `/metrics` in the text exposition format.
+
+    A minimal registry (counters, gauges and histograms with labels) instead of `prometheus_client`, safe to update from the event loop and from worker threads. Recorded:
+
+    - `http_requests_total`, `http_request_duration_seconds` by route name, method and status (`MetricsMiddleware`), the duration includes streaming the response body
+    - `http_requests_in_flight`
+    - `mongodb_command_duration_seconds` by command and outcome, from pymongo command monitoring (`MongoCommandMetrics`, registered on both clients)
+    - `external_call_duration_seconds` by service (`cloudinary`, `smtp`), operation and outcome (`observe_external`)
+    - gauges read when scraped (threadpool usage, caches, limiters...), see `Registry.register_stats`
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names: Iterable[str], values: Iterable[Any], **extra: Any) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*sorted(buckets), float("inf"))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # [count per bucket..., sum]
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-1] += value
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _labels(self.labelnames, key, le=_number(bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_number(state[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class StatsGauges(Metric):
+    """
+    gauges read from a `stats()` function when scraped, `{prefix}_{key}` for every numeric key. With `label`, `stats()` returns one dict per label value
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        prefix: str,
+        documentation: str,
+        stats: Callable[[], dict[str, Any]],
+        label: Optional[str] = None,
+    ):
+        super().__init__(prefix, documentation)
+        self.stats = stats
+        self.label = label
+
+    def render(self) -> Iterator[str]:
+        groups = self.stats() if self.label else {None: self.stats()}
+        samples: dict[str, list[str]] = {}
+        for label_value, values in groups.items():
+            labels = (
+                "" if self.label is None else _labels((self.label,), (label_value,))
+            )
+            for key, value in (values or {}).items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    samples.setdefault(key, []).append(f"{labels} {_number(value)}")
+        for key, lines in samples.items():
+            name = f"{self.name}_{key}"
+            yield f"# HELP {name} {self.documentation}"
+            yield f"# TYPE {name} gauge"
+            for line in lines:
+                yield name + line
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(
+        self,
+        prefix: str,
+        documentation: str,
+        stats: Callable[[], dict[str, Any]],
+        label: Optional[str] = None,
+    ) -> None:
+        self.register(StatsGauges(prefix, documentation, stats, label))
+
+    def render(self) -> str:
+        return (
+            "\n".join(line for metric in self._metrics for line in metric.render())
+            + "\n"
+        )
+
+
+registry = Registry()
+
+http_requests_total = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route name, method and status",
+        ("route", "method", "status"),
+    )
+)
+http_request_duration_seconds = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency, response body included",
+        ("route", "method", "status"),
+    )
+)
+http_requests_in_flight = registry.register(
+    Gauge("http_requests_in_flight", "HTTP requests being handled")
+)
+mongodb_command_duration_seconds = registry.register(
+    Histogram(
+        "mongodb_command_duration_seconds",
+        "MongoDB command latency reported by the driver",
+        ("command", "outcome"),
+        buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+    )
+)
+external_call_duration_seconds = registry.register(
+    Histogram(
+        "external_call_duration_seconds",
+        "Latency of calls to external services",
+        ("service", "operation", "outcome"),
+    )
+)
+
+
+@contextmanager
+def observe_external(service: str, operation: str) -> Iterator[None]:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        external_call_duration_seconds.observe(
+            time.perf_counter() - started,
+            service=service,
+            operation=operation,
+            outcome=outcome,
+        )
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    command timings of a pymongo client (`event_listeners=[...]`), the durations are measured by the driver
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        mongodb_command_duration_seconds.observe(
+            event.duration_micros / 1_000_000,
+            command=event.command_name,
+            outcome="succeeded",
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        mongodb_command_duration_seconds.observe(
+            event.duration_micros / 1_000_000,
+            command=event.command_name,
+            outcome="failed",
+        )
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording `http_*` metrics, labelled by route name (`mounted` for static files and `unmatched` when no route matched, to bound the label values)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status_code = 500
+        http_requests_in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            labels = {
+                "route": route_name(scope),
+                "method": scope["method"],
+                "status": status_code,
+            }
+            http_requests_total.inc(**labels)
+            http_request_duration_seconds.observe(
+                time.perf_counter() - started, **labels
+            )
+
+
+def route_name(scope: dict[str, Any]) -> str:
+    if (route := scope.get("route")) is not None:
+        return getattr(route, "name", None) or "unnamed"
+    # mounted apps (static files) only set the endpoint
+    return "mounted" if "endpoint" in scope else "unmatched"
+
+
+def metrics_text() -> str:
+    return registry.render()
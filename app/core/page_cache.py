@@ -0,0 +1,310 @@
+"""
+    In-process cache of rendered pages (the events listing and the event pages), with ETags.
+
+    A page is cached per user and url together with the scopes it was rendered from (`event_scope`, `user_scope`) and a stamp of their versions taken before its queries ran. Writes bump the scopes they change:
+    - `user_scope` when an event is created
+    - `event_scope` whenever the counters of an event change (invites created or accepted, see `increment_event_stats`), the delivery status of one of its invites changes or its counters are repaired
+
+    A cached page is served as long as none of its scopes was bumped after its stamp, so a write racing a render never leaves a stale page behind. The versions live (`settings.PAGE_CACHE_BACKEND`):
+    - `memory` (default): in the app process, a clock moved forward by every bump, hits and `304 Not Modified` answers never query the database. Every process only sees its own bumps, with several uvicorn workers a write handled by another worker is seen once the page expires
+    - `mongo`: in the `page_versions` collection, one document per bumped scope holding a random version, so every worker sees every bump. A hit costs one lookup by `_id`, a bump one `bulk_write`. The versions of the scopes a render finds (the events of a listing) are read after it, a write racing that render can leave the page behind until it expires
+
+    Responses carry a weak ETag of their body and `Cache-Control: private, no-cache`, a browser revalidating a cached page gets a `304 Not Modified` without rendering it. Pages are evicted least recently used first once `settings.PAGE_CACHE_MAX_BYTES` of bodies are cached, and expire after `settings.PAGE_CACHE_TTL_SECONDS`.
+"""
+
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+from cachetools import TTLCache
+from fastapi import Request, Response, status
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core import settings, get_async_collection, get_collection, MONGO_COLLECTIONS
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def event_scope(event_id: str) -> str:
+    return f"event:{event_id}"
+
+
+def user_scope(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def make_etag(body: bytes) -> str:
+    # weak, the gzipped and the plain response are the same page
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if (if_none_match := request.headers.get("If-None-Match")) is None:
+        return False
+    # weak comparison, a strong `"..."` matches `W/"..."`
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+@dataclass(slots=True)
+class CachedPage:
+    # versions of `scopes` when it was rendered, see `PageCache.stamp`
+    stamp: Any
+    scopes: tuple[str, ...]
+    etag: str
+    body: bytes
+    media_type: Optional[str]
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(request, self.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(self.body, media_type=self.media_type, headers=headers)
+
+
+class MemoryPageVersions:
+    """
+    clock and scope versions of the app process, the oldest scopes are forgotten once `max_scopes` are tracked
+    """
+
+    def __init__(self, max_scopes: int = 100_000):
+        # scope -> clock value of its last bump, oldest bump first
+        self._versions: dict[str, int] = {}
+        self.max_scopes = max_scopes
+        # scopes that are no longer tracked count as bumped at `_floor`
+        self._floor = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    async def stamp(self, scopes: tuple[str, ...]) -> int:
+        # a bump of any scope moves the clock, the scopes found later are covered too
+        with self._lock:
+            return self._clock
+
+    async def complete(self, stamp: int, scopes: tuple[str, ...]) -> int:
+        return stamp
+
+    async def fresh(self, stamp: int, scopes: tuple[str, ...]) -> bool:
+        with self._lock:
+            return all(
+                self._versions.get(scope, self._floor) <= stamp for scope in scopes
+            )
+
+    def bump_sync(self, scopes: tuple[str, ...]) -> None:
+        with self._lock:
+            self._clock += 1
+            for scope in scopes:
+                self._versions.pop(scope, None)
+                self._versions[scope] = self._clock
+            while len(self._versions) > self.max_scopes:
+                oldest = next(iter(self._versions))
+                self._floor = self._versions.pop(oldest)
+
+    async def bump(self, scopes: tuple[str, ...]) -> None:
+        self.bump_sync(scopes)
+
+    def size(self) -> Optional[int]:
+        return len(self._versions)
+
+
+class MongoPageVersions:
+    """
+    scope versions shared by every app process, one document per bumped scope
+
+    a version is a fresh `ObjectId` rather than a counter, a scope whose document expired and is bumped again never gets back a version a cached page holds
+    """
+
+    def __init__(self, ttl: float):
+        # the pages a bump invalidates expire within `ttl`, its document is kept twice as long and removed by a TTL index
+        self.ttl = ttl
+
+    async def _read(self, scopes: tuple[str, ...]) -> dict[str, ObjectId]:
+        if not scopes:
+            return {}
+        collection = get_async_collection(MONGO_COLLECTIONS.PAGE_VERSIONS)
+        return {
+            scope["_id"]: scope["version"]
+            async for scope in collection.find(
+                {"_id": {"$in": list(scopes)}}, {"version": 1}
+            )
+        }
+
+    async def stamp(self, scopes: tuple[str, ...]) -> dict[str, Optional[ObjectId]]:
+        versions = await self._read(scopes)
+        return {scope: versions.get(scope) for scope in scopes}
+
+    async def complete(
+        self, stamp: dict[str, Optional[ObjectId]], scopes: tuple[str, ...]
+    ) -> dict[str, Optional[ObjectId]]:
+        found = tuple(scope for scope in scopes if scope not in stamp)
+        return stamp | await self.stamp(found)
+
+    async def fresh(
+        self, stamp: dict[str, Optional[ObjectId]], scopes: tuple[str, ...]
+    ) -> bool:
+        versions = await self._read(scopes)
+        return all(versions.get(scope) == stamp.get(scope) for scope in scopes)
+
+    def _updates(self, scopes: tuple[str, ...]) -> list[UpdateOne]:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=2 * self.ttl)
+        return [
+            UpdateOne(
+                {"_id": scope},
+                {"$set": {"version": ObjectId(), "expires_at": expires_at}},
+                upsert=True,
+            )
+            for scope in scopes
+        ]
+
+    def bump_sync(self, scopes: tuple[str, ...]) -> None:
+        get_collection(MONGO_COLLECTIONS.PAGE_VERSIONS).bulk_write(
+            self._updates(scopes), ordered=False
+        )
+
+    async def bump(self, scopes: tuple[str, ...]) -> None:
+        await get_async_collection(MONGO_COLLECTIONS.PAGE_VERSIONS).bulk_write(
+            self._updates(scopes), ordered=False
+        )
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class PageCache:
+    """
+    rendered pages by `(user id, url)`, invalidated by scope version stamps
+    """
+
+    def __init__(self, *, max_bytes: int, ttl: float, versions):
+        self._pages: TTLCache[tuple[str, str], CachedPage] = TTLCache(
+            maxsize=max_bytes, ttl=ttl, getsizeof=lambda page: len(page.body)
+        )
+        self.versions = versions
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.failed_bumps = 0
+
+    async def stamp(self, *scopes: str) -> Any:
+        """
+        taken before the queries of a page with the scopes known then, pass it to `store`
+        """
+        return await self.versions.stamp(scopes)
+
+    def bump_sync(self, *scopes: str) -> None:
+        """
+        `bump` for the code running off the event loop (background workers)
+        """
+        try:
+            self.versions.bump_sync(scopes)
+        except Exception as exc:
+            self._bump_failed(scopes, exc)
+
+    async def bump(self, *scopes: str) -> None:
+        """
+        marks the pages rendered from `scopes` as stale, call it after the write
+        """
+        try:
+            await self.versions.bump(scopes)
+        except Exception as exc:
+            self._bump_failed(scopes, exc)
+
+    def _bump_failed(self, scopes: tuple[str, ...], exc: Exception) -> None:
+        # the pages of `scopes` may be served until they expire
+        with self._lock:
+            self.failed_bumps += 1
+        logger.warning(f"failed to bump the page cache scopes {scopes}: {exc}")
+
+    async def respond(self, request: Request, user_id: str) -> Optional[Response]:
+        """
+        the cached page for `request`, `None` when it has to be rendered
+        """
+        key = (user_id, str(request.url))
+        with self._lock:
+            page = self._pages.get(key)
+        if page is not None and not await self.versions.fresh(page.stamp, page.scopes):
+            with self._lock:
+                if self._pages.get(key) is page:
+                    del self._pages[key]
+            page = None
+        with self._lock:
+            if page is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self._respond(page, request)
+
+    def _respond(self, page: CachedPage, request: Request) -> Response:
+        response = page.response(request)
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            with self._lock:
+                self.not_modified += 1
+        return response
+
+    async def store(
+        self,
+        request: Request,
+        user_id: str,
+        stamp: Any,
+        scopes: Iterable[str],
+        response: Response,
+    ) -> Response:
+        """
+        caches a rendered page and returns the response to send
+        """
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        scopes = tuple(scopes)
+        page = CachedPage(
+            stamp=await self.versions.complete(stamp, scopes),
+            scopes=scopes,
+            etag=make_etag(response.body),
+            body=response.body,
+            media_type=response.media_type,
+        )
+        # a page larger than the whole cache is not kept, a bump landing after this check is caught by `respond`
+        if len(page.body) <= self._pages.maxsize and await self.versions.fresh(
+            page.stamp, scopes
+        ):
+            with self._lock:
+                self._pages[(user_id, str(request.url))] = page
+        return self._respond(page, request)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "pages": len(self._pages),
+                "bytes": self._pages.currsize,
+                "max_bytes": self._pages.maxsize,
+                "scopes": self.versions.size(),
+                "failed_bumps": self.failed_bumps,
+            }
+
+
+def _versions():
+    if settings.PAGE_CACHE_BACKEND == "mongo":
+        return MongoPageVersions(settings.PAGE_CACHE_TTL_SECONDS)
+    return MemoryPageVersions()
+
+
+page_cache = PageCache(
+    max_bytes=settings.PAGE_CACHE_MAX_BYTES,
+    ttl=settings.PAGE_CACHE_TTL_SECONDS,
+    versions=_versions(),
+)
@@ -0,0 +1,52 @@
+"""
+    Keyset (cursor) pagination over `_id`.
+
+    A page is the `limit` documents following the `_id` of the last document of the previous page, so every page is an index range scan of `limit + 1` documents however deep it is (unlike `skip`, which walks every skipped document). ObjectIds grow with their creation time, so pages are in creation order.
+"""
+
+from typing import Any, Optional
+
+from bson import ObjectId
+from fastapi import status
+from pymongo.asynchronous.collection import AsyncCollection
+
+from app.core.utils import HTTPMessageException
+
+
+def parse_cursor(after: Optional[str]) -> Optional[ObjectId]:
+    if after is None:
+        return None
+    if not ObjectId.is_valid(after):
+        raise HTTPMessageException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message="invalid page cursor",
+            success=False,
+        )
+    return ObjectId(after)
+
+
+async def find_page(
+    collection: AsyncCollection,
+    query: dict[str, Any],
+    *,
+    projection: dict[str, Any],
+    after: Optional[str],
+    limit: int,
+) -> tuple[list[dict[str, Any]], Optional[str]]:
+    """
+    returns the documents of a page, with `_id` turned into a string `id`, and the cursor of the next page (`None` on the last page)
+    """
+    if (cursor := parse_cursor(after)) is not None:
+        query = {**query, "_id": {"$gt": cursor}}
+
+    # one extra document tells whether there is a next page
+    documents = await collection.find(
+        query, projection, sort=[("_id", 1)], limit=limit + 1
+    ).to_list(limit + 1)
+
+    next_after = str(documents[limit - 1]["_id"]) if len(documents) > limit else None
+    page = []
+    for document in documents[:limit]:
+        document["id"] = str(document.pop("_id"))
+        page.append(document)
+    return page, next_after
@@ -0,0 +1,154 @@
+"""
+    Password hashing (bcrypt) off the request path.
+
+    bcrypt burns hundreds of milliseconds of CPU per call, `password_hasher` runs it in a small process pool so a burst of logins cannot stall the event loop or the threadpool of unrelated requests. At most `workers + max_queue` calls are in flight, any more is rejected with a 503 instead of piling up.
+
+    On startup the bcrypt cost (`rounds`) is tuned so a hash takes about `settings.BCRYPT_TARGET_SECONDS` in a pool process (unless `settings.BCRYPT_ROUNDS` pins it). Hashes below that cost are rehashed when their user logs in (see `needs_update`). Pin `BCRYPT_ROUNDS` when app processes run on different hardware, otherwise each of them tunes its own cost.
+"""
+
+import asyncio
+import logging
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import status
+from fastapi.concurrency import run_in_threadpool
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.utils import HTTPMessageException
+from app.password_worker import hash_password, time_hash, verify_password
+
+logger = logging.getLogger(__name__)
+
+# the passlib default, used until the pool is started
+DEFAULT_ROUNDS = 12
+
+
+def tuned_rounds(
+    seconds: float,
+    measured_rounds: int,
+    target: float,
+    min_rounds: int,
+    max_rounds: int,
+) -> int:
+    """
+    highest cost hashing within `target` seconds, every extra round doubles the time of `seconds` measured at `measured_rounds`
+    """
+    rounds = measured_rounds + math.floor(math.log2(target / seconds))
+    return max(min_rounds, min(max_rounds, rounds))
+
+
+class PasswordHasher:
+    """
+    bcrypt in a bounded process pool
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = settings.BCRYPT_ROUNDS or DEFAULT_ROUNDS
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._context = self._context_for(self.rounds)
+        self._in_flight = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _context_for(rounds: int) -> CryptContext:
+        # hashes below `rounds` need an update, stronger ones are kept
+        return CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__min_rounds=rounds
+        )
+
+    async def start(self) -> None:
+        if self._executor is not None:
+            return
+        # `spawn`, forking a process running the event loop and the mongo client threads is unsafe, the processes only import `app.password_worker`
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        if settings.BCRYPT_ROUNDS is None:
+            await self.tune()
+        logger.info(
+            f"started {self.workers} password hashing process(es), bcrypt rounds: {self.rounds}"
+        )
+
+    def stop(self) -> None:
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+
+    async def tune(self) -> int:
+        loop = asyncio.get_running_loop()
+        # the first call also pays for starting the process
+        await loop.run_in_executor(
+            self._executor, time_hash, settings.BCRYPT_MIN_ROUNDS
+        )
+        seconds = min(
+            [
+                await loop.run_in_executor(
+                    self._executor, time_hash, settings.BCRYPT_MIN_ROUNDS
+                )
+                for _ in range(2)
+            ]
+        )
+        self.rounds = tuned_rounds(
+            seconds,
+            settings.BCRYPT_MIN_ROUNDS,
+            settings.BCRYPT_TARGET_SECONDS,
+            settings.BCRYPT_MIN_ROUNDS,
+            settings.BCRYPT_MAX_ROUNDS,
+        )
+        self._context = self._context_for(self.rounds)
+        return self.rounds
+
+    async def _run(self, func: Callable[..., Any], *args, json_res: bool) -> Any:
+        if self._in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPMessageException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                message="Too many password checks in progress, please try again shortly",
+                success=False,
+                json_res=json_res,
+                headers={"Retry-After": "1"},
+            )
+        self._in_flight += 1
+        try:
+            if self._executor is None:
+                # not started (scripts), the threadpool keeps it off the event loop
+                return await run_in_threadpool(func, *args)
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, *args
+            )
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str, *, json_res: bool = True) -> str:
+        return await self._run(hash_password, password, self.rounds, json_res=json_res)
+
+    async def verify(
+        self, password: str, hashed_password: str, *, json_res: bool = True
+    ) -> bool:
+        return await self._run(
+            verify_password, password, hashed_password, json_res=json_res
+        )
+
+    def needs_update(self, hashed_password: str) -> bool:
+        return self._context.needs_update(hashed_password)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "rejected": self.rejected,
+            "rounds": self.rounds,
+        }
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE
+)
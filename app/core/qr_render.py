@@ -0,0 +1,147 @@
+"""
+    QR code rendering straight from the module matrix.
+
+    `qrcode` is only used to encode the content into its matrix of dark/light modules, the image is then written without PIL:
+    - PNG: a 1-bit grayscale image, every matrix row is packed into a scanline once (one `int` conversion for the whole row) and repeated `box_size` times, the scanlines are deflated with `zlib`
+    - SVG: a single `<path>` with one rectangle per horizontal run of dark modules, scaled by the `viewBox`
+
+    The PNG is pixel for pixel the image PIL renders, about 30% smaller. The SVG is larger but stays sharp at any size.
+"""
+
+import struct
+import zlib
+from typing import Literal
+
+import qrcode
+from qrcode import constants
+
+from app.core.config import settings
+
+QRFormat = Literal["png", "svg"]
+QRErrorCorrection = Literal["L", "M", "Q", "H"]
+
+ERROR_CORRECTION_LEVELS: dict[QRErrorCorrection, int] = {
+    "L": constants.ERROR_CORRECT_L,
+    "M": constants.ERROR_CORRECT_M,
+    "Q": constants.ERROR_CORRECT_Q,
+    "H": constants.ERROR_CORRECT_H,
+}
+
+MEDIA_TYPES: dict[QRFormat, str] = {"png": "image/png", "svg": "image/svg+xml"}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def qr_matrix(
+    content: str,
+    error_correction: QRErrorCorrection = "L",
+    mask_pattern: int | None = None,
+) -> list[list[bool]]:
+    """
+    encodes `content` and returns its module matrix (`True` for dark modules) without the quiet zone
+
+    without a `mask_pattern` all 8 masks are scored and the best one is used, which is most of the encoding time
+    """
+    if not content:
+        raise Exception("qr code content is required")
+
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=ERROR_CORRECTION_LEVELS[error_correction],
+        border=0,
+        mask_pattern=mask_pattern,
+    )
+    qr.add_data(content)
+    qr.make(fit=True)
+    return qr.modules
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
+
+def matrix_to_png(
+    matrix: list[list[bool]], *, box_size: int, border: int, compression: int = 6
+) -> bytes:
+    """
+    writes the matrix as a 1-bit grayscale PNG, `box_size` pixels per module and a quiet zone of `border` modules
+    """
+    width = (len(matrix) + 2 * border) * box_size
+    row_bytes = (width + 7) // 8
+    # in a 1-bit grayscale image 1 is white and 0 is black
+    light, dark = "1" * box_size, "0" * box_size
+    quiet_zone = light * border
+    padding = "1" * (row_bytes * 8 - width)
+
+    def scanline(bits: str) -> bytes:
+        # each scanline starts with its filter type, 0 (none)
+        return b"\x00" + int(bits + padding, 2).to_bytes(row_bytes, "big")
+
+    blank_lines = scanline(light * (len(matrix) + 2 * border)) * (border * box_size)
+    rows = [blank_lines]
+    for modules in matrix:
+        bits = quiet_zone + "".join(dark if m else light for m in modules) + quiet_zone
+        rows.append(scanline(bits) * box_size)
+    rows.append(blank_lines)
+
+    header = struct.pack(">IIBBBBB", width, width, 1, 0, 0, 0, 0)
+    return b"".join(
+        (
+            PNG_SIGNATURE,
+            _png_chunk(b"IHDR", header),
+            _png_chunk(b"IDAT", zlib.compress(b"".join(rows), compression)),
+            _png_chunk(b"IEND", b""),
+        )
+    )
+
+
+def matrix_to_svg(matrix: list[list[bool]], *, box_size: int, border: int) -> bytes:
+    """
+    writes the matrix as an SVG path in module units, `box_size` only sets the displayed size
+    """
+    size = len(matrix) + 2 * border
+    runs = []
+    for y, modules in enumerate(matrix):
+        x = 0
+        while x < len(modules):
+            if not modules[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(modules) and modules[x]:
+                x += 1
+            runs.append(f"M{start + border} {y + border}h{x - start}v1h-{x - start}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+        f'width="{size * box_size}" height="{size * box_size}" shape-rendering="crispEdges">'
+        f'<rect width="100%" height="100%" fill="#fff"/>'
+        f'<path d="{"".join(runs)}"/></svg>'
+    ).encode()
+
+
+def render_qrcode(
+    content: str,
+    *,
+    image_format: QRFormat | None = None,
+    box_size: int | None = None,
+    border: int | None = None,
+    error_correction: QRErrorCorrection | None = None,
+) -> bytes:
+    """
+    renders `content` as a QR code image, options left out default to the `QR_*` settings
+    """
+    matrix = qr_matrix(
+        content,
+        error_correction or settings.QR_ERROR_CORRECTION,
+        settings.QR_MASK_PATTERN,
+    )
+    box_size = box_size or settings.QR_BOX_SIZE
+    border = settings.QR_BORDER if border is None else border
+    if (image_format or settings.QR_IMAGE_FORMAT) == "svg":
+        return matrix_to_svg(matrix, box_size=box_size, border=border)
+    return matrix_to_png(matrix, box_size=box_size, border=border)
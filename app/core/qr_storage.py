@@ -0,0 +1,105 @@
+"""
+    Storage of invite QR code images, picked with `settings.QR_STORAGE_BACKEND`:
+    - `cloudinary`: the image is rendered and uploaded to cloudinary, the invite keeps the cloudinary url and public id
+    - `local`: nothing is stored, the invite links to `/events/invite/{code}/qr.png` which renders the image on demand
+
+    A QR code image is fully determined by the content it encodes, so the `local` backend needs no network round trip and no storage. Rendered images are kept in an LRU (`qr_images`) and served with a strong ETag and a long-lived `Cache-Control`.
+"""
+
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urljoin
+
+from cachetools import LRUCache
+
+from app.core.cloudinary_uploader import create_n_upload_qrcode, deleteImage
+from app.core.config import settings
+from app.core.qr_render import render_qrcode
+
+
+@dataclass
+class StoredQRCode:
+    url: str
+    public_id: Optional[str] = None
+
+
+class QRStorage(ABC):
+    """
+    base class of the QR code storage backends
+    """
+
+    @abstractmethod
+    def store(self, code: str, content: str) -> StoredQRCode:
+        """
+        makes the QR code of the invite `code` (encoding `content`) available and returns its url
+        """
+
+    @abstractmethod
+    def delete(self, public_id: str) -> None:
+        ...
+
+
+class CloudinaryQRStorage(QRStorage):
+    def store(self, code: str, content: str) -> StoredQRCode:
+        cloudinary_res = create_n_upload_qrcode(content)
+        return StoredQRCode(
+            url=cloudinary_res.secure_url, public_id=cloudinary_res.public_id
+        )
+
+    def delete(self, public_id: str) -> None:
+        deleteImage(public_id)
+
+
+class LocalQRStorage(QRStorage):
+    def store(self, code: str, content: str) -> StoredQRCode:
+        # `content` is the verification url of the invite (`/events/verify-invite/{code}`),
+        # the image is served by the sibling `/events/invite/{code}/qr.png` route
+        return StoredQRCode(url=urljoin(content, f"../invite/{code}/qr.png"))
+
+    def delete(self, public_id: str) -> None:
+        return None
+
+
+@dataclass(frozen=True)
+class QRImage:
+    content: bytes
+    etag: str
+
+
+class QRImageCache:
+    """
+    LRU of rendered PNG QR codes keyed by invite code
+    """
+
+    def __init__(self, maxsize: int):
+        self._images: LRUCache[str, QRImage] = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, code: str) -> QRImage | None:
+        with self._lock:
+            return self._images.get(code)
+
+    def render(self, code: str, content: str) -> QRImage:
+        """
+        renders the QR code of `code` (encoding `content`) and caches it, CPU bound so call it off the event loop
+        """
+        image_bytes = render_qrcode(content, image_format="png")
+        image = QRImage(
+            content=image_bytes,
+            etag=f'"{hashlib.sha256(image_bytes).hexdigest()[:32]}"',
+        )
+        with self._lock:
+            self._images[code] = image
+        return image
+
+
+QR_STORAGE_BACKENDS: dict[str, type[QRStorage]] = {
+    "cloudinary": CloudinaryQRStorage,
+    "local": LocalQRStorage,
+}
+
+qr_storage: QRStorage = QR_STORAGE_BACKENDS[settings.QR_STORAGE_BACKEND]()
+qr_images = QRImageCache(maxsize=settings.QR_IMAGE_CACHE_MAXSIZE)
@@ -0,0 +1,172 @@
+"""
+    Sliding window rate limiting (login throttling).
+
+    A limiter allows `limit` hits per `window` seconds and key. It keeps the hit count of the current and of the previous fixed window and weighs the previous one by how much of it still overlaps the sliding window, so a key costs two counters whatever its traffic. Rejected hits are counted too, a client hammering the endpoint stays locked out.
+
+    Counters live in the app process (`memory`) or in the `rate_limits` collection (`mongo`, see `settings.RATE_LIMIT_BACKEND`) so every uvicorn worker shares them, expired windows are removed by a TTL index.
+"""
+
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from fastapi import Request, status
+from pymongo import ReturnDocument
+
+from app.core import settings, get_async_collection, MONGO_COLLECTIONS
+from app.core.utils import HTTPMessageException
+
+
+class MemoryRateLimitBackend:
+    """
+    window counters of the app process, keys whose windows are over are pruned once `max_keys` are tracked
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> [window, current window count, previous window count]
+        self._counters: dict[str, list[int]] = {}
+
+    async def increment(self, key: str, window: int) -> tuple[int, int]:
+        """
+        counts a hit of `key` in `window`, returns the counts of `window` and of the window before
+        """
+        counter = self._counters.get(key)
+        if counter is None or counter[0] < window - 1:
+            if counter is None and len(self._counters) >= self.max_keys:
+                self._prune(window)
+            counter = self._counters[key] = [window, 0, 0]
+        elif counter[0] == window - 1:
+            counter[:] = [window, 0, counter[1]]
+        counter[1] += 1
+        return counter[1], counter[2]
+
+    def _prune(self, window: int) -> None:
+        for key in [
+            key for key, counter in self._counters.items() if counter[0] < window - 1
+        ]:
+            del self._counters[key]
+        # still full, the oldest keys go
+        while len(self._counters) >= self.max_keys:
+            del self._counters[next(iter(self._counters))]
+
+    def size(self) -> int:
+        return len(self._counters)
+
+
+class MongoRateLimitBackend:
+    """
+    window counters shared by every app process, one document per key and window
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+
+    async def increment(self, key: str, window: int) -> tuple[int, int]:
+        collection = get_async_collection(MONGO_COLLECTIONS.RATE_LIMITS)
+        # kept until the window no longer overlaps the sliding window
+        expires_at = datetime.fromtimestamp(
+            (window + 2) * self.window_seconds, timezone.utc
+        )
+        current = await collection.find_one_and_update(
+            {"_id": f"{key}:{window}"},
+            {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": expires_at}},
+            projection={"count": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        previous = await collection.find_one(
+            {"_id": f"{key}:{window - 1}"}, {"count": 1}
+        )
+        return current["count"], previous["count"] if previous is not None else 0
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class SlidingWindowLimiter:
+    def __init__(self, name: str, limit: int, window_seconds: float, backend):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.backend = backend
+        self.allowed = 0
+        self.rejected = 0
+
+    async def hit(self, key: str) -> Optional[float]:
+        """
+        counts a hit of `key`, returns `None` when it is allowed or the seconds to wait before trying again
+        """
+        now = time.time()
+        window = int(now // self.window_seconds)
+        current, previous = await self.backend.increment(f"{self.name}:{key}", window)
+        elapsed = now - window * self.window_seconds
+        overlap = (self.window_seconds - elapsed) / self.window_seconds
+        if previous * overlap + current <= self.limit:
+            self.allowed += 1
+            return None
+        self.rejected += 1
+        return self.window_seconds - elapsed
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window_seconds,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "keys": self.backend.size(),
+        }
+
+
+def client_ip(request: Request) -> str:
+    if settings.ENVIRONMENT == "production":
+        # behind the load balancer, it appends the address it received the request from
+        if forwarded_for := request.headers.get("X-Forwarded-For"):
+            return forwarded_for.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _backend():
+    if settings.RATE_LIMIT_BACKEND == "mongo":
+        return MongoRateLimitBackend(settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS)
+    return MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+
+_login_backend = _backend()
+login_ip_limiter = SlidingWindowLimiter(
+    "login-ip",
+    settings.LOGIN_RATE_LIMIT_PER_IP,
+    settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+    _login_backend,
+)
+login_email_limiter = SlidingWindowLimiter(
+    "login-email",
+    settings.LOGIN_RATE_LIMIT_PER_EMAIL,
+    settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+    _login_backend,
+)
+
+
+async def check_login_rate(request: Request, email: str) -> None:
+    """
+    raises a 429 once the client address or the email exceeds its login attempts
+    """
+    retry_after = await login_ip_limiter.hit(client_ip(request))
+    if retry_after is None:
+        retry_after = await login_email_limiter.hit(email.strip().lower())
+    if retry_after is not None:
+        raise HTTPMessageException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            message="Too many login attempts, please try again later",
+            success=False,
+            json_res=True,
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def rate_limit_stats() -> dict[str, Any]:
+    return {
+        "login_ip": login_ip_limiter.stats(),
+        "login_email": login_email_limiter.stats(),
+    }
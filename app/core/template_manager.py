@@ -1,13 +1,28 @@
 from fastapi.templating import Jinja2Templates
 from datetime import datetime
+from jinja2 import pass_context
 
 
 def _format_datetime(value: datetime, fmt="%Y-%m-%d %H:%M:%S"):
     return value.strftime(fmt)
 
 
+# source path -> fingerprinted path, set when the static build is served (see `app/static_assets.py`)
+static_manifest: dict[str, str] = {}
+
+
+@pass_context
+def static_url(context, path: str):
+    """
+    url of a file of `static/`, e.g. `static_url('js/base.js')`
+    """
+    path = path.lstrip("/")
+    return context["request"].url_for("static", path=static_manifest.get(path, path))
+
+
 templates = Jinja2Templates(directory="templates")
 templates.env.filters["strftime"] = _format_datetime
+templates.env.globals["static_url"] = static_url
 
 # other `strftime` formats
 # formatted_date1 = now.strftime("%A, %d %B %Y") Tuesday, 04 February 2025
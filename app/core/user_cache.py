@@ -0,0 +1,77 @@
+"""
+    In-process cache of authenticated users.
+
+    `get_current_user` runs on every authenticated request, the cache spares it the `users` lookup and the `UserModel` validation for `settings.USER_CACHE_TTL_SECONDS`. Entries are keyed by `(user_id, token)` so a token is only ever served the user it was issued for, and are dropped:
+    - for every token of a user when the password changes or the account is deactivated (`invalidate_user`)
+    - for a single token on logout (`invalidate_token`)
+
+    Every process has its own cache, a change made by another process is seen once the entry expires.
+"""
+
+import threading
+from typing import Any
+
+from cachetools import TTLCache
+
+from app.auth.auth_models import UserModel
+from app.core.config import settings
+
+
+class UserCache:
+    """
+    TTL/LRU cache of active users with hit/miss counters
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float):
+        self._users: TTLCache[tuple[str, str], UserModel] = TTLCache(
+            maxsize=maxsize, ttl=ttl
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, token: str) -> UserModel | None:
+        with self._lock:
+            user = self._users.get((user_id, token))
+            if user is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return user
+
+    def set(self, user_id: str, token: str, user: UserModel) -> None:
+        with self._lock:
+            self._users[(user_id, token)] = user
+
+    def invalidate_user(self, user_id: str) -> None:
+        """
+        drops the cached user for every token, call it whenever the user document changes
+        """
+        with self._lock:
+            for key in [key for key in self._users.keys() if key[0] == user_id]:
+                self._users.pop(key, None)
+
+    def invalidate_token(self, token: str) -> None:
+        with self._lock:
+            for key in [key for key in self._users.keys() if key[1] == token]:
+                self._users.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": len(self._users),
+                "maxsize": self._users.maxsize,
+            }
+
+
+user_cache = UserCache(
+    maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
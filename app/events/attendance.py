@@ -0,0 +1,182 @@
+"""
+    Live attendance of events, pushed to organiser dashboards over a WebSocket.
+
+    `attendance` is an in-process pub/sub: the check-in path publishes every accepted guest once and the broker fans it out to the queue of every dashboard watching the event, so dashboards never poll MongoDB. Running totals are read from the event counters when the first dashboard of an event connects and then kept up to date from the published check-ins.
+
+    The broker lives in the app process, with several workers a dashboard only sees the check-ins handled by the worker it is connected to. The totals of watched events are read again from the event counters every `settings.ATTENDANCE_REFRESH_INTERVAL_SECONDS` (one query for all of them) and pushed when they changed, so they also count the check-ins of the other workers.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Optional
+
+from bson import ObjectId
+
+from app.core import settings, get_async_collection, MONGO_COLLECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+async def count_attendance(event_id: str) -> dict[str, int]:
+    event = await get_async_collection(MONGO_COLLECTIONS.EVENTS).find_one(
+        {"_id": ObjectId(event_id)}, {"invited_count": 1, "accepted_count": 1}
+    )
+    if event is not None and "invited_count" in event and "accepted_count" in event:
+        # maintained by `app.events.event_stats`
+        return {"invited": event["invited_count"], "accepted": event["accepted_count"]}
+
+    # events created before the counters
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
+    invited = await invite_collection.count_documents({"event_invited_to": event_id})
+    accepted = await invite_collection.count_documents(
+        {"event_invited_to": event_id, "invite_accepted": True}
+    )
+    return {"invited": invited, "accepted": accepted}
+
+
+async def count_attendance_many(event_ids: list[str]) -> dict[str, dict[str, int]]:
+    """
+    `count_attendance` of every event in `event_ids`, the counters in one query
+    """
+    totals = {}
+    async for event in get_async_collection(MONGO_COLLECTIONS.EVENTS).find(
+        {"_id": {"$in": [ObjectId(event_id) for event_id in event_ids]}},
+        {"invited_count": 1, "accepted_count": 1},
+    ):
+        if "invited_count" in event and "accepted_count" in event:
+            totals[str(event["_id"])] = {
+                "invited": event["invited_count"],
+                "accepted": event["accepted_count"],
+            }
+    for event_id in event_ids:
+        if event_id not in totals:
+            totals[event_id] = await count_attendance(event_id)
+    return totals
+
+
+class AttendanceBroker:
+    """
+    per event fan-out of attendance updates to subscriber queues
+    """
+
+    def __init__(self, queue_size: int = 100, refresh_interval: Optional[float] = None):
+        self.queue_size = queue_size
+        self.refresh_interval = refresh_interval
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._totals: dict[str, dict[str, int]] = {}
+        # event id -> number of local updates of its totals, a refresh that raced one is dropped
+        self._updates: dict[str, int] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+    def watched(self, event_id: str) -> bool:
+        return bool(self._subscribers.get(event_id))
+
+    async def subscribe(self, event_id: str) -> asyncio.Queue:
+        # the totals are read before the queue is registered, no update is published without them
+        if event_id not in self._totals:
+            totals = await count_attendance(event_id)
+            self._totals.setdefault(event_id, totals)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(event_id, set()).add(queue)
+        if self.refresh_interval and self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh())
+        return queue
+
+    def unsubscribe(self, event_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(event_id, set())
+        subscribers.discard(queue)
+        if not subscribers:
+            # totals are only kept up to date while someone is watching
+            self._subscribers.pop(event_id, None)
+            self._totals.pop(event_id, None)
+            self._updates.pop(event_id, None)
+
+    async def _refresh(self) -> None:
+        """
+        reads the totals of the watched events from their counters every `refresh_interval` seconds, until no event is watched
+        """
+        try:
+            while self._subscribers:
+                await asyncio.sleep(self.refresh_interval)
+                event_ids = list(self._subscribers)
+                updates = {
+                    event_id: self._updates.get(event_id, 0) for event_id in event_ids
+                }
+                try:
+                    counted = await count_attendance_many(event_ids)
+                except Exception as exc:
+                    logger.warning(f"failed to refresh attendance totals: {exc}")
+                    continue
+                for event_id, totals in counted.items():
+                    if (
+                        not self.watched(event_id)
+                        or self._updates.get(event_id, 0) != updates[event_id]
+                        or self._totals.get(event_id) == totals
+                    ):
+                        continue
+                    self._totals[event_id] = totals
+                    self._publish(event_id, {"type": "totals", "totals": dict(totals)})
+        finally:
+            self._refresher = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "events": len(self._subscribers),
+            "dashboards": sum(map(len, self._subscribers.values())),
+        }
+
+    def totals(self, event_id: str) -> Optional[dict[str, int]]:
+        if (totals := self._totals.get(event_id)) is None:
+            return None
+        return dict(totals)
+
+    def _publish(self, event_id: str, message: dict[str, Any]) -> None:
+        for queue in self._subscribers.get(event_id, ()):
+            if queue.full():
+                # a slow dashboard loses its oldest update rather than holding up the others
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def invited(self, event_id: str, count: int = 1) -> None:
+        if not self.watched(event_id) or count <= 0:
+            return
+        if (totals := self._totals.get(event_id)) is not None:
+            totals["invited"] += count
+            self._updates[event_id] = self._updates.get(event_id, 0) + 1
+        self._publish(event_id, {"type": "invited", "totals": self.totals(event_id)})
+
+    def checked_in(self, event_id: str, guests: list[dict[str, Any]]) -> None:
+        """
+        publishes newly accepted `guests` (`fullname`, `invite_accepted_at`)
+        """
+        if not self.watched(event_id) or not guests:
+            return
+        if (totals := self._totals.get(event_id)) is not None:
+            totals["accepted"] += len(guests)
+            self._updates[event_id] = self._updates.get(event_id, 0) + 1
+        self._publish(
+            event_id,
+            {
+                "type": "check_in",
+                "guests": [
+                    {
+                        "fullname": guest.get("fullname"),
+                        "invite_accepted_at": _isoformat(
+                            guest.get("invite_accepted_at")
+                        ),
+                    }
+                    for guest in guests
+                ],
+                "totals": self.totals(event_id),
+            },
+        )
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+attendance = AttendanceBroker(
+    refresh_interval=settings.ATTENDANCE_REFRESH_INTERVAL_SECONDS
+)
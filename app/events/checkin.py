@@ -0,0 +1,197 @@
+"""
+    Invite check-in (QR code scans at the door).
+
+    A check-in is a single conditional `find_one_and_update` on `{"code": ..., "invite_accepted": False}`, the database accepts an invite at most once so two simultaneous scans of the same QR code cannot both succeed. Only a scan that did not accept the invite needs a second query, to tell a used invite from an unknown code.
+
+    Codes that cannot be invite codes (see `app.core.invite_codes`) are reported `unknown` without a query.
+
+    Batches of scans (`check_in_many`, replayed scanner queues and offline syncs) are applied with one unordered `bulk_write` of conditional updates and classified with one `$in` query, whatever the batch size. The invites a batch accepts are stamped with its id (`accepted_in`) by the conditional write itself, only those are reported `accepted` (to their earliest scan) and counted, so one QR code never admits two guests, whatever a concurrent check-in or a replayed batch does. An invite that was already accepted is reported `already_used`, an earlier scan in the batch only moves its acceptance time back.
+
+    Newly accepted invites are published to the live attendance dashboards (see `app.events.attendance`) and added to the event counters (see `app.events.event_stats`) in the background, the scanner gets its answer without waiting for the counters.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Any, Literal, Optional
+
+from bson import ObjectId
+from pydantic import BaseModel, Field
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.asynchronous.collection import AsyncCollection
+
+from app.core.invite_codes import is_valid_invite_code
+from .attendance import attendance
+from .event_stats import increment_event_stats_later
+
+CheckInStatus = Literal["accepted", "already_used", "unknown"]
+
+CHECK_IN_PROJECTION = {"fullname": 1, "invite_accepted_at": 1, "event_invited_to": 1}
+
+MAX_BATCH_SCANS = 10_000
+
+
+class CheckInResult(BaseModel):
+    status: CheckInStatus
+    code: str
+    fullname: Optional[str] = None
+    invite_accepted_at: Optional[datetime] = None
+    event_id: Optional[str] = Field(default=None, exclude=True)
+
+    @classmethod
+    def of_invite(
+        cls, status: CheckInStatus, code: str, invite: dict[str, Any]
+    ) -> "CheckInResult":
+        return cls(
+            status=status,
+            code=code,
+            fullname=invite.get("fullname"),
+            invite_accepted_at=invite.get("invite_accepted_at"),
+            event_id=invite.get("event_invited_to"),
+        )
+
+
+class Scan(BaseModel):
+    code: str
+    # defaults to the time the scan is received
+    scanned_at: Optional[datetime] = None
+
+
+class BatchCheckInDto(BaseModel):
+    scans: list[Scan] = Field(min_length=1, max_length=MAX_BATCH_SCANS)
+
+
+def stored_time(moment: datetime) -> datetime:
+    """
+    `moment` as stored by mongo: a naive local time (invite times come from `datetime.now()`) in milliseconds
+    """
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.replace(microsecond=moment.microsecond // 1000 * 1000)
+
+
+async def check_in(
+    invite_collection: AsyncCollection, code: str, created_by: str
+) -> CheckInResult:
+    """
+    accepts the invite `code` of an event created by `created_by`
+    """
+    if not is_valid_invite_code(code):
+        return CheckInResult(status="unknown", code=code)
+    query = {"code": code, "created_by": created_by}
+    now = datetime.now()
+    invite = await invite_collection.find_one_and_update(
+        {**query, "invite_accepted": False},
+        {
+            "$set": {
+                "invite_accepted": True,
+                "invite_accepted_at": now,
+                "updated_at": now,
+            }
+        },
+        projection=CHECK_IN_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if invite is not None:
+        result = CheckInResult.of_invite("accepted", code, invite)
+        increment_event_stats_later(result.event_id, accepted=1)
+        attendance.checked_in(result.event_id, [invite])
+        return result
+
+    if (invite := await invite_collection.find_one(query, CHECK_IN_PROJECTION)) is None:
+        return CheckInResult(status="unknown", code=code)
+    return CheckInResult.of_invite("already_used", code, invite)
+
+
+async def check_in_many(
+    invite_collection: AsyncCollection,
+    scans: list[Scan],
+    query: dict[str, Any],
+    received_at: Optional[datetime] = None,
+    event_id: Optional[str] = None,
+) -> list[CheckInResult]:
+    """
+    applies `scans` to the invites matching `query` (e.g. `{"created_by": ...}`) and returns the outcome of every scan, in order, codes of another event than `event_id` are rejected without a query
+
+    a scan accepts an invite that is not accepted yet or was accepted later than the scan, scanner clocks ahead of the server are clamped to `received_at`
+    """
+    received_at = stored_time(received_at or datetime.now())
+    scans = [
+        Scan(
+            code=scan.code,
+            scanned_at=min(stored_time(scan.scanned_at or received_at), received_at),
+        )
+        for scan in scans
+    ]
+    valid_scans = [scan for scan in scans if is_valid_invite_code(scan.code, event_id)]
+    if not valid_scans:
+        return [CheckInResult(status="unknown", code=scan.code) for scan in scans]
+
+    # the earliest scan of every code, the one that can win
+    earliest: dict[str, datetime] = {}
+    for scan in valid_scans:
+        if scan.code not in earliest or scan.scanned_at < earliest[scan.code]:
+            earliest[scan.code] = scan.scanned_at
+
+    # stamps the invites this batch accepts, a concurrent check-in accepting one first leaves it unstamped
+    batch_id = str(ObjectId())
+    updates = []
+    for code, scanned_at in earliest.items():
+        checked_in = {"invite_accepted_at": scanned_at, "updated_at": received_at}
+        updates.append(
+            UpdateOne(
+                {**query, "code": code, "invite_accepted": False},
+                {
+                    "$set": {
+                        "invite_accepted": True,
+                        "accepted_in": batch_id,
+                        **checked_in,
+                    }
+                },
+            )
+        )
+        # an invite accepted later than the scan is re-dated, it was accepted already
+        updates.append(
+            UpdateOne(
+                {**query, "code": code, "invite_accepted_at": {"$gt": scanned_at}},
+                {"$set": checked_in},
+            )
+        )
+    await invite_collection.bulk_write(updates, ordered=False)
+
+    invites = {
+        invite["code"]: invite
+        async for invite in invite_collection.find(
+            {**query, "code": {"$in": list(earliest)}},
+            {"code": 1, "accepted_in": 1, **CHECK_IN_PROJECTION},
+        )
+    }
+    results = []
+    reported = set()
+    newly_accepted: dict[str, list[dict[str, Any]]] = {}
+    for scan in scans:
+        if (invite := invites.get(scan.code)) is None:
+            results.append(CheckInResult(status="unknown", code=scan.code))
+            continue
+        # accepted by this batch (a re-dated invite was accepted before), reported to the earliest scan only
+        if (
+            invite.get("accepted_in") == batch_id
+            and scan.code not in reported
+            and invite.get("invite_accepted_at") == scan.scanned_at
+        ):
+            reported.add(scan.code)
+            results.append(CheckInResult.of_invite("accepted", scan.code, invite))
+            newly_accepted.setdefault(invite.get("event_invited_to"), []).append(invite)
+        else:
+            results.append(CheckInResult.of_invite("already_used", scan.code, invite))
+
+    for accepted_event_id, guests in newly_accepted.items():
+        increment_event_stats_later(accepted_event_id, accepted=len(guests))
+        attendance.checked_in(accepted_event_id, guests)
+    return results
+
+
+def count_outcomes(results: list[CheckInResult]) -> dict[str, int]:
+    counts = Counter(result.status for result in results)
+    return {
+        status: counts[status] for status in ("accepted", "already_used", "unknown")
+    }
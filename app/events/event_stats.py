@@ -0,0 +1,241 @@
+"""
+    Per event guest counters.
+
+    Every event keeps `invited_count` and `accepted_count`, incremented with `$inc` right after invites are inserted (`create_invitation`, guest list imports) or accepted (`app.events.checkin`), so event listings show them without counting invites.
+
+    The increments are separate writes, a crash between an invite write and its increment leaves a counter off. `reconcile_event_stats` recomputes the counters with one aggregation over the invites and repairs the events that drifted:
+
+    - `python -m app.events.event_stats reconcile [--event EVENT_ID ...]`
+    - or periodically in the app with `settings.EVENT_STATS_RECONCILE_INTERVAL_SECONDS`
+
+    An increment lands a little after its invite write, so the events with invites written in the last `settings.EVENT_STATS_RECONCILE_GRACE_SECONDS` are left for the next run: their invites may be counted while their increments are still on the way. A repair is an `$inc` of the difference, conditional on the counters that were read.
+
+    Events created before the counters have none, `$inc` skips them (a first increment would start from 0 and not from their invites) until `backfill_event_stats` counts their invites, in the background on startup (retried until no event is left) or with `python -m app.events.event_stats backfill`.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core import settings, get_collection, get_async_collection, MONGO_COLLECTIONS
+from app.core.page_cache import event_scope, page_cache
+
+logger = logging.getLogger(__name__)
+
+STATS_FIELDS = ("invited_count", "accepted_count")
+
+# increments running in the background, referenced until they are done
+_pending: set[asyncio.Task] = set()
+
+
+async def increment_event_stats(
+    event_id: str, *, invited: int = 0, accepted: int = 0
+) -> None:
+    """
+    adds to the counters of `event_id`, a failure is only logged (the invites are already written, `reconcile_event_stats` repairs the counters)
+    """
+    increments = {
+        field: count for field, count in zip(STATS_FIELDS, (invited, accepted)) if count
+    }
+    if not increments:
+        return
+    try:
+        await get_async_collection(MONGO_COLLECTIONS.EVENTS).update_one(
+            {"_id": ObjectId(event_id), STATS_FIELDS[0]: {"$exists": True}},
+            {"$inc": increments},
+        )
+    except Exception as exc:
+        logger.warning(f"failed to update the stats of event {event_id}: {exc}")
+    finally:
+        # after the write (a page rendered before it is never left fresh), the invites are written so the pages showing them are stale whether or not the counters are
+        await page_cache.bump(event_scope(event_id))
+
+
+def increment_event_stats_later(
+    event_id: str, *, invited: int = 0, accepted: int = 0
+) -> None:
+    """
+    `increment_event_stats` in a background task, for the paths answering before the counters are written (check-ins)
+    """
+    task = asyncio.create_task(
+        increment_event_stats(event_id, invited=invited, accepted=accepted)
+    )
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def drain_event_stats() -> None:
+    """
+    waits for the increments still running, on shutdown
+    """
+    if _pending:
+        await asyncio.gather(*_pending, return_exceptions=True)
+
+
+def reconcile_event_stats(event_ids: Optional[list[str]] = None) -> dict[str, int]:
+    """
+    recomputes the counters of `event_ids` (every event by default) from the invites and fixes the ones that drifted
+    """
+    event_collection = get_collection(MONGO_COLLECTIONS.EVENTS)
+    invite_collection = get_collection(MONGO_COLLECTIONS.INVITE)
+
+    event_query, invite_match = {}, {}
+    if event_ids is not None:
+        event_query = {"_id": {"$in": [ObjectId(event_id) for event_id in event_ids]}}
+        invite_match = {"event_invited_to": {"$in": event_ids}}
+
+    # the increments of older invite writes have landed
+    cutoff = datetime.now() - timedelta(
+        seconds=settings.EVENT_STATS_RECONCILE_GRACE_SECONDS
+    )
+    # read before counting, an event incremented in between no longer matches and is left for the next run
+    stored = {
+        str(event["_id"]): {field: event.get(field) for field in STATS_FIELDS}
+        for event in event_collection.find(event_query, dict.fromkeys(STATS_FIELDS, 1))
+    }
+    counted = {
+        row["_id"]: row
+        for row in invite_collection.aggregate(
+            [
+                {"$match": invite_match},
+                {
+                    "$group": {
+                        "_id": "$event_invited_to",
+                        "invited_count": {"$sum": 1},
+                        "accepted_count": {
+                            "$sum": {
+                                "$cond": [{"$eq": ["$invite_accepted", True]}, 1, 0]
+                            }
+                        },
+                        "last_created": {"$max": "$created_at"},
+                        "last_checked_in": {"$max": "$updated_at"},
+                    }
+                },
+            ]
+        )
+    }
+
+    updates, drifted, skipped = [], [], 0
+    for event_id, stats in stored.items():
+        row = counted.get(event_id, {})
+        expected = {field: row.get(field, 0) for field in STATS_FIELDS}
+        if stats == expected:
+            continue
+        if any(
+            (last_write := row.get(field)) is not None and last_write >= cutoff
+            for field in ("last_created", "last_checked_in")
+        ):
+            skipped += 1
+            continue
+        drifted.append(event_id)
+        # a missing counter (an event created before them) is created by the `$inc`
+        updates.append(
+            UpdateOne(
+                {"_id": ObjectId(event_id), **stats},
+                {
+                    "$inc": {
+                        field: expected[field] - (stats[field] or 0)
+                        for field in STATS_FIELDS
+                    }
+                },
+            )
+        )
+    repaired = 0
+    if updates:
+        repaired = event_collection.bulk_write(updates, ordered=False).modified_count
+        page_cache.bump_sync(*map(event_scope, drifted))
+    if repaired:
+        logger.info(f"repaired the stats of {repaired} event(s)")
+    return {"events": len(stored), "repaired": repaired, "skipped": skipped}
+
+
+def backfill_event_stats() -> dict[str, int]:
+    """
+    counts the invites of the events that have no counters yet, the ones with recent invite writes are `skipped`
+    """
+    event_ids = [
+        str(event["_id"])
+        for event in get_collection(MONGO_COLLECTIONS.EVENTS).find(
+            {STATS_FIELDS[0]: {"$exists": False}}, {"_id": 1}
+        )
+    ]
+    if not event_ids:
+        return {"events": 0, "repaired": 0, "skipped": 0}
+    return reconcile_event_stats(event_ids)
+
+
+class EventStatsReconciler:
+    """
+    runs `backfill_event_stats` until no event is left, then `reconcile_event_stats` every `interval` seconds, in a background thread
+    """
+
+    def __init__(self, interval: Optional[float], grace: float):
+        self.interval = interval
+        self.grace = grace
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="event-stats-reconciler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _backfill(self) -> bool:
+        try:
+            return not backfill_event_stats()["skipped"]
+        except Exception as exc:
+            logger.error(f"failed to backfill event stats: {exc}")
+            return False
+
+    def _run(self) -> None:
+        # the skipped events had recent invite writes, they are counted once the grace is over
+        while not self._backfill():
+            if self._stop.wait(self.grace):
+                return
+        if not self.interval:
+            return
+        while not self._stop.wait(self.interval):
+            try:
+                reconcile_event_stats()
+            except Exception as exc:
+                logger.error(f"failed to reconcile event stats: {exc}")
+
+
+event_stats_reconciler = EventStatsReconciler(
+    settings.EVENT_STATS_RECONCILE_INTERVAL_SECONDS,
+    settings.EVENT_STATS_RECONCILE_GRACE_SECONDS,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="maintain per event guest counters")
+    parser.add_argument("command", choices=("reconcile", "backfill"))
+    parser.add_argument("--event", action="append", dest="event_ids")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        print(json.dumps(backfill_event_stats(), indent=2))
+        return
+    print(json.dumps(reconcile_event_stats(args.event_ids), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 import secrets
 from bson import ObjectId
+from dataclasses import dataclass
+from functools import lru_cache
 from pydantic import BaseModel, Field, ConfigDict, EmailStr, HttpUrl
 from datetime import datetime
-from typing import Union, List, Optional
+from typing import Any, Union, List, Optional, Literal
 
 from app.auth.auth_models import PyObjectId
 
@@ -19,6 +21,9 @@ class EventModel(BaseModel):
     start_date: datetime
     end_date: datetime
     is_active: bool = True
+    # maintained by `app.events.event_stats`
+    invited_count: int = 0
+    accepted_count: int = 0
     created_by: PyObjectId
     created_at: datetime = Field(default_factory=datetime.now)
 
@@ -59,6 +64,10 @@ class EventCollection(BaseModel):
     events: List[EventModel]
 
 
+# `pending` -> `processing` -> `delivered` | `failed`, a failed attempt goes back to `pending` until the attempts run out
+DeliveryStatus = Literal["pending", "processing", "delivered", "failed"]
+
+
 class InviteModel(BaseModel):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
     email: EmailStr = Field(max_length=255)
@@ -67,8 +76,20 @@ class InviteModel(BaseModel):
     code: str
     invite_accepted: bool = False
     invite_accepted_at: Optional[datetime] = None
-    qr_code_img_url: HttpUrl
-    qr_code_img_public_key: str
+    # time of the last check-in change, offline scans carry an earlier `invite_accepted_at`
+    updated_at: Optional[datetime] = None
+    # id of the check-in batch that accepted the invite (see `check_in_many`)
+    accepted_in: Optional[str] = None
+    # content embedded in the QR code
+    verification_url: Optional[str] = None
+    # set by the delivery worker once the QR code is uploaded
+    qr_code_img_url: Optional[HttpUrl] = None
+    qr_code_img_public_key: Optional[str] = None
+    # invites created before background delivery have no `delivery_status`
+    delivery_status: Optional[DeliveryStatus] = None
+    delivery_attempts: int = 0
+    delivery_error: Optional[str] = None
+    next_attempt_at: Optional[datetime] = None
     created_by: PyObjectId
     created_at: datetime = Field(default_factory=datetime.now)
 
@@ -91,3 +112,74 @@ class UpdateInviteModel(BaseModel):
 
 class InviteCollection(BaseModel):
     invites: List[InviteModel]
+
+
+# Read models of documents read back from the database. They were validated when written, validating them again (`EmailStr`, `HttpUrl`...) on every page render is wasted CPU, so these skip pydantic entirely. Writes keep going through the models above.
+
+
+@dataclass(slots=True)
+class EventListItem:
+    """
+    row of the events listing, from a `find_page` document
+    """
+
+    id: str
+    name: str
+    description: str
+    invited_count: int = 0
+    accepted_count: int = 0
+
+    @classmethod
+    def from_document(cls, document: dict[str, Any]) -> "EventListItem":
+        return cls(
+            id=document["id"],
+            name=document["name"],
+            description=document["description"],
+            invited_count=document.get("invited_count", 0),
+            accepted_count=document.get("accepted_count", 0),
+        )
+
+
+@dataclass(slots=True)
+class GuestListItem:
+    """
+    row of the guest listing of an event, from a `find_page` document
+    """
+
+    id: str
+    email: str
+    fullname: str
+    delivery_status: Optional[DeliveryStatus] = None
+
+    @classmethod
+    def from_document(cls, document: dict[str, Any]) -> "GuestListItem":
+        return cls(
+            id=document["id"],
+            email=document["email"],
+            fullname=document["fullname"],
+            delivery_status=document.get("delivery_status"),
+        )
+
+
+@lru_cache
+def _dump_plan(model: type[BaseModel]) -> tuple[tuple[str, str, Any], ...]:
+    # (field name, document key, field info) in field order
+    return tuple(
+        (name, field.alias or name, field) for name, field in model.model_fields.items()
+    )
+
+
+def dump_trusted(model: type[BaseModel], document: dict[str, Any]) -> dict[str, Any]:
+    """
+    what `model(**document).model_dump()` returns for a document `model` validated when it was written, without validating it again: the fields in order, defaults for the missing ones and ObjectIds as strings
+    """
+    dumped = {}
+    for name, key, field in _dump_plan(model):
+        if key in document:
+            value = document[key]
+        elif name in document:
+            value = document[name]
+        else:
+            value = field.get_default(call_default_factory=True)
+        dumped[name] = str(value) if isinstance(value, ObjectId) else value
+    return dumped
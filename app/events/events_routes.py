@@ -1,58 +1,131 @@
+import asyncio
 from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
-from fastapi import APIRouter, Request, Form, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from typing import Annotated
-from secrets import token_urlsafe
+from fastapi import (
+    APIRouter,
+    Request,
+    Form,
+    Query,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import (
+    HTMLResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
+from typing import Annotated, Literal, Optional
 import urllib.parse
 
-from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from .events_models import (
     CreateEventModel,
     EventModel,
-    EventCollection,
     InviteModel,
     CreateInviteModel,
-    InviteCollection,
+    EventListItem,
+    GuestListItem,
+    dump_trusted,
+)
+from app.core import settings, templates
+from app.core import get_collection, get_async_collection, MONGO_COLLECTIONS
+from app.core.deps import CurrentUserDeps, get_current_user
+from app.core.invite_codes import (
+    is_valid_invite_code,
+    new_invite_code,
+    signing_enabled,
+)
+from app.core.page_cache import etag_matches, event_scope, page_cache, user_scope
+from app.core.pagination import find_page
+from app.core.qr_storage import qr_images
+from app.core.utils import HTTPMessageException, Message, collection_error_msg
+from app.static_assets import accepted_encodings
+from .attendance import attendance
+from .event_stats import increment_event_stats
+from .checkin import BatchCheckInDto, check_in, check_in_many, count_outcomes
+from .invite_delivery import invite_delivery
+from .offline_checkin import (
+    SyncScansDto,
+    build_snapshot,
+    snapshot_public_key,
+    sync_scans,
+    to_version,
 )
-from app.core import templates
-from app.core import get_collection, MONGO_COLLECTIONS
-from app.core.deps import CurrentUserDeps
-from app.core.utils import HTTPMessageException, collection_error_msg
-from app.core.cloudinary_uploader import create_n_upload_qrcode
-from app.core.mailing import generate_event_invitation_email, send_email
+from .invite_export import (
+    EXPORT_COLUMNS,
+    MEDIA_TYPES,
+    ExportFormat,
+    export_rows,
+    gzip_chunks,
+)
+from .invite_import import GuestListError, import_guest_list
 
 router = APIRouter(prefix="/events")
 
+PageSizeQuery = Annotated[int, Query(ge=1, le=settings.LIST_MAX_PAGE_SIZE)]
+
 
 @router.get("/", name="events")
-def get_events_page(request: Request, current_user: CurrentUserDeps) -> HTMLResponse:
-    event_collection = get_collection(MONGO_COLLECTIONS.EVENTS)
+async def get_events_page(
+    request: Request,
+    current_user: CurrentUserDeps,
+    after: Optional[str] = None,
+    limit: PageSizeQuery = settings.LIST_PAGE_SIZE,
+) -> HTMLResponse:
+    event_collection = get_async_collection(MONGO_COLLECTIONS.EVENTS)
     if event_collection is None:
         raise HTTPMessageException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             message=collection_error_msg("create_event", MONGO_COLLECTIONS.EVENTS.name),
             success=False,
         )
+    if (response := await page_cache.respond(request, current_user.id)) is not None:
+        return response
+
+    stamp = await page_cache.stamp(user_scope(current_user.id))
+    # only the columns shown in the listing
+    events, next_after = await find_page(
+        event_collection,
+        {"created_by": current_user.id},
+        projection={
+            "name": 1,
+            "description": 1,
+            "invited_count": 1,
+            "accepted_count": 1,
+        },
+        after=after,
+        limit=limit,
+    )
 
-    events = event_collection.find({"created_by": current_user.id}).to_list(1000)
-    events_list = EventCollection(events=events).model_dump()
-
-    context = {"email": current_user.email, "events": events_list["events"]}
+    context = {
+        "email": current_user.email,
+        "events": [EventListItem.from_document(event) for event in events],
+        "after": after,
+        "next_after": next_after,
+        "limit": limit,
+    }
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         request=request, name="events_page.html", context=context
     )
+    # the counters shown change with the events
+    scopes = [user_scope(current_user.id), *(event_scope(e["id"]) for e in events)]
+    return await page_cache.store(request, current_user.id, stamp, scopes, response)
 
 
 @router.post("/create", name="create_event")
-def create_event(
+async def create_event(
     request: Request,
     event_dto: Annotated[CreateEventModel, Form()],
     current_user: CurrentUserDeps,
 ):
-    event_collection = get_collection(MONGO_COLLECTIONS.EVENTS)
+    event_collection = get_async_collection(MONGO_COLLECTIONS.EVENTS)
     if event_collection is None:
         raise HTTPMessageException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -65,7 +138,8 @@ def create_event(
     event = EventModel(**event_dto)
 
     # create a new event
-    event_collection.insert_one(event.model_dump(by_alias=True, exclude=["id"]))
+    await event_collection.insert_one(event.model_dump(by_alias=True, exclude=["id"]))
+    await page_cache.bump(user_scope(current_user.id))
 
     return RedirectResponse(
         url=request.url_for("events"), status_code=status.HTTP_302_FOUND
@@ -73,13 +147,13 @@ def create_event(
 
 
 @router.post("/create-invitation/{event_id}", name="create_invitation")
-def create_invitation(
+async def create_invitation(
     request: Request,
     event_id: str,
     invite_dto: Annotated[CreateInviteModel, Form()],
     current_user: CurrentUserDeps,
 ) -> RedirectResponse:
-    event_collection = get_collection(MONGO_COLLECTIONS.EVENTS)
+    event_collection = get_async_collection(MONGO_COLLECTIONS.EVENTS)
     if event_collection is None:
         raise HTTPMessageException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -89,7 +163,7 @@ def create_invitation(
             success=False,
         )
 
-    invite_collection = get_collection(MONGO_COLLECTIONS.INVITE)
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
     if invite_collection is None:
         raise HTTPMessageException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -100,7 +174,7 @@ def create_invitation(
         )
 
     if (
-        event := event_collection.find_one(
+        event := await event_collection.find_one(
             {"_id": ObjectId(event_id), "created_by": current_user.id}
         )
     ) is None:
@@ -112,7 +186,7 @@ def create_invitation(
     event = EventModel(**event)
 
     if (
-        invite_exist := invite_collection.find_one(
+        invite_exist := await invite_collection.find_one(
             {"email": invite_dto.email, "event_invited_to": event_id}
         )
     ) is not None:
@@ -121,71 +195,127 @@ def create_invitation(
             message=f"guest with email '{invite_dto.email}' has already been invited to this event",
         )
 
-    rand_code = f"INVITE_{token_urlsafe(8)}"
+    rand_code = new_invite_code(event_id)
     code_url = request.url_for("verify_invite_code", invite_code=rand_code)
-    try:
-        cloudinary_res = create_n_upload_qrcode(code_url)
-    except Exception as exception:
-        print(exception)
-        raise HTTPMessageException(
-            message=(
-                exception.message
-                if hasattr(exception, "message")
-                else "Something went wrong"
-            ),
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            success=False,
-        )
 
+    # the QR code upload and the invitation email are handled by `invite_delivery`
     invite = InviteModel(
         email=invite_dto.email,
         fullname=invite_dto.fullname,
         event_invited_to=event_id,
         code=rand_code,
-        qr_code_img_url=cloudinary_res.secure_url,
-        qr_code_img_public_key=cloudinary_res.public_id,
+        verification_url=str(code_url),
+        delivery_status="pending",
+        next_attempt_at=datetime.now(),
         created_by=current_user.id,
     )
 
-    invite_collection.insert_one(invite.model_dump(by_alias=True, exclude=["id"]))
-    # new_invite = invite_collection.find_one({"_id": inserted_invite.inserted_id})
-
     try:
-        email_data = generate_event_invitation_email(
-            fullname=invite.fullname,
-            qrcode_img_url=invite.qr_code_img_url,
-            event_name=event.name,
-            org_name="Organiser",
-            org_contact=current_user.email,
+        await invite_collection.insert_one(
+            invite.model_dump(by_alias=True, exclude=["id"])
         )
+    except DuplicateKeyError:
+        # the same guest was invited concurrently
+        raise HTTPMessageException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message=f"guest with email '{invite_dto.email}' has already been invited to this event",
+        )
+    invite_delivery.notify()
+    await increment_event_stats(event_id, invited=1)
+    attendance.invited(event_id)
+
+    return RedirectResponse(
+        url=request.url_for("single_event", event_id=event_id),
+        status_code=status.HTTP_302_FOUND,
+    )
+
 
-        send_email(
-            email_to=invite.email,
-            html_content=email_data.html_content,
-            subject=email_data.subject,
+@router.post(
+    "/import-invitations/{event_id}",
+    name="import_invitations",
+    response_model=Message,
+)
+async def import_invitations(
+    request: Request,
+    event_id: str,
+    guest_list: UploadFile,
+    current_user: CurrentUserDeps,
+):
+    """
+    Invite every guest in an uploaded CSV guest list (`email`, `fullname` columns)
+    """
+    event_collection = get_async_collection(MONGO_COLLECTIONS.EVENTS)
+    if event_collection is None:
+        raise HTTPMessageException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message=collection_error_msg(
+                "import_invitations", MONGO_COLLECTIONS.EVENTS.name
+            ),
+            success=False,
+            json_res=True,
         )
-    except Exception as exc:
-        print("#### FAILED TO SEND GUEST INVITATION EMAIL ####")
-        print(exc)
-        print("#### FAILED TO SEND GUEST INVITATION EMAIL ####")
 
+    # the import streams the uploaded file and runs in the threadpool with the blocking client
+    invite_collection = get_collection(MONGO_COLLECTIONS.INVITE)
+    if invite_collection is None:
         raise HTTPMessageException(
-            message=(
-                exc.message if hasattr(exc, "message") else "Something went wrong"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message=collection_error_msg(
+                "import_invitations", MONGO_COLLECTIONS.INVITE.name
             ),
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             success=False,
+            json_res=True,
         )
 
-    return RedirectResponse(
-        url=request.url_for("single_event", event_id=event_id),
-        status_code=status.HTTP_302_FOUND,
+    if (
+        event := await event_collection.find_one(
+            {"_id": ObjectId(event_id), "created_by": current_user.id}
+        )
+    ) is None:
+        raise HTTPMessageException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            message="event does not exist",
+            success=False,
+            json_res=True,
+        )
+    event = EventModel(**event)
+
+    try:
+        report = await run_in_threadpool(
+            import_guest_list,
+            guest_list.file,
+            event=event,
+            created_by=current_user.id,
+            invite_collection=invite_collection,
+            build_verify_url=lambda code: str(
+                request.url_for("verify_invite_code", invite_code=code)
+            ),
+        )
+        invite_delivery.notify(report.invited)
+    except GuestListError as exc:
+        raise HTTPMessageException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message=exc.message,
+            success=False,
+            json_res=True,
+        )
+
+    await increment_event_stats(event_id, invited=report.invited)
+    attendance.invited(event_id, report.invited)
+
+    return Message(
+        status_code=status.HTTP_200_OK,
+        message=f"{report.invited} guest(s) invited, {report.skipped} skipped, {report.failed} failed",
+        success=True,
+        data=report.model_dump(),
     )
 
 
 @router.get("/invite/{invite_id}", name="single_invite")
-def single_invite_page(request: Request, invite_id: str, current_user: CurrentUserDeps):
-    invite_collection = get_collection(MONGO_COLLECTIONS.INVITE)
+async def single_invite_page(
+    request: Request, invite_id: str, current_user: CurrentUserDeps
+):
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
     if invite_collection is None:
         raise HTTPMessageException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -195,25 +325,74 @@ def single_invite_page(request: Request, invite_id: str, current_user: CurrentUs
             success=False,
         )
     if (
-        invite := invite_collection.find_one(
+        invite := await invite_collection.find_one(
             {"_id": ObjectId(invite_id), "created_by": current_user.id}
         )
     ) is None:
         raise HTTPMessageException(
             status_code=status.HTTP_404_NOT_FOUND, message="invite does not exist"
         )
-    invite = InviteModel(**invite)
-    context = {"invite": invite.model_dump()}
+    context = {"invite": dump_trusted(InviteModel, invite)}
     return templates.TemplateResponse(
         request=request, name="invite_details_page.html", context=context
     )
 
 
+@router.get("/invite/{invite_code}/qr.png", name="invite_qr_code")
+async def invite_qr_code(request: Request, invite_code: str) -> Response:
+    """
+    QR code image of an invite, rendered on demand. Public, it is linked from the invitation email
+    """
+    if not is_valid_invite_code(invite_code):
+        raise HTTPMessageException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            message="invite does not exist",
+            success=False,
+            json_res=True,
+        )
+    if (image := qr_images.get(invite_code)) is None:
+        invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
+        if invite_collection is None:
+            raise HTTPMessageException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                message=collection_error_msg(
+                    "invite_qr_code", MONGO_COLLECTIONS.INVITE.name
+                ),
+                success=False,
+                json_res=True,
+            )
+        if (
+            invite := await invite_collection.find_one(
+                {"code": invite_code}, {"verification_url": 1}
+            )
+        ) is None:
+            raise HTTPMessageException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                message="invite does not exist",
+                success=False,
+                json_res=True,
+            )
+        # the QR code encodes the verification url saved with the invite, not one built
+        # from this request, so the cached image does not depend on the request's host
+        content = invite.get("verification_url") or str(
+            request.url_for("verify_invite_code", invite_code=invite_code)
+        )
+        image = await run_in_threadpool(qr_images.render, invite_code, content)
+
+    headers = {
+        "ETag": image.etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if etag_matches(request, image.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=image.content, media_type="image/png", headers=headers)
+
+
 @router.get("/verify-invite/{invite_code}", name="verify_invite_code")
-def verify_invite_code(
+async def verify_invite_code(
     request: Request, invite_code: str, current_user: CurrentUserDeps
 ):
-    invite_collection = get_collection(MONGO_COLLECTIONS.INVITE)
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
     if invite_collection is None:
         raise HTTPMessageException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -223,44 +402,115 @@ def verify_invite_code(
             success=False,
         )
 
-    if (
-        invite := invite_collection.find_one(
-            {"code": invite_code, "created_by": current_user.id}
-        )
-    ) is None:
+    result = await check_in(invite_collection, invite_code, current_user.id)
+    if result.status == "unknown":
         raise HTTPMessageException(
             status_code=status.HTTP_404_NOT_FOUND, message="invite does not exist"
         )
-    invite = InviteModel(**invite)
-
-    if invite.invite_accepted or invite.invite_accepted_at is not None:
+    if result.status == "already_used":
         raise HTTPMessageException(
             message="Invitation already accepted",
             status_code=status.HTTP_400_BAD_REQUEST,
         )
-    update_opt = {"invite_accepted": True, "invite_accepted_at": datetime.now()}
 
-    update_result = invite_collection.find_one_and_update(
-        {"_id": ObjectId(invite.id)},
-        {"$set": update_opt},
-        return_document=ReturnDocument.AFTER,
+    query_string = urllib.parse.urlencode(
+        {"message": f"{result.fullname}'s invite is valid"}
+    )
+    return RedirectResponse(
+        status_code=status.HTTP_302_FOUND,
+        url=f"{request.url_for("verification_result")}?{query_string}",
     )
-    if update_result is not None:
-        query_string = urllib.parse.urlencode(
-            {"message": f"{invite.fullname}'s invite is valid"}
+
+
+@router.post("/check-in", name="batch_check_in", response_model=Message)
+async def batch_check_in(batch_dto: BatchCheckInDto, current_user: CurrentUserDeps):
+    """
+    Check in a batch of scanned codes (e.g. a replayed scanner queue), returns the outcome of every scan and aggregate counts
+    """
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
+    if invite_collection is None:
+        raise HTTPMessageException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message=collection_error_msg(
+                "batch_check_in", MONGO_COLLECTIONS.INVITE.name
+            ),
+            success=False,
+            json_res=True,
         )
-        return RedirectResponse(
-            status_code=status.HTTP_302_FOUND,
-            url=f"{request.url_for("verification_result")}?{query_string}",
+
+    results = await check_in_many(
+        invite_collection, batch_dto.scans, {"created_by": current_user.id}
+    )
+    counts = count_outcomes(results)
+    return Message(
+        status_code=status.HTTP_200_OK,
+        message=f"{counts['accepted']} of {len(results)} scan(s) accepted",
+        success=True,
+        data={
+            "counts": counts,
+            "results": [result.model_dump() for result in results],
+        },
+    )
+
+
+@router.post(
+    "/check-in/{invite_code}",
+    name="check_in_invite",
+    response_model=Message,
+)
+async def check_in_invite(invite_code: str, current_user: CurrentUserDeps):
+    """
+    Check a guest in from a scanner device, `data.status` is `accepted`, `already_used` or `unknown`
+    """
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
+    if invite_collection is None:
+        raise HTTPMessageException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message=collection_error_msg(
+                "check_in_invite", MONGO_COLLECTIONS.INVITE.name
+            ),
+            success=False,
+            json_res=True,
         )
-    else:
+
+    result = await check_in(invite_collection, invite_code, current_user.id)
+    messages = {
+        "accepted": f"{result.fullname}'s invite is valid",
+        "already_used": "Invitation already accepted",
+        "unknown": "invite does not exist",
+    }
+    return Message(
+        status_code=status.HTTP_200_OK,
+        message=messages[result.status],
+        success=result.status == "accepted",
+        data=result.model_dump(),
+    )
+
+
+@router.get(
+    "/check-in/snapshot-key", name="offline_snapshot_key", response_model=Message
+)
+async def offline_snapshot_key(current_user: CurrentUserDeps):
+    """
+    Public key verifying the signature of offline check-in snapshots
+    """
+    if not signing_enabled():
         raise HTTPMessageException(
-            status_code=status.HTTP_404_NOT_FOUND, details="invite does not exist"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message="Offline check-in is unavailable, SECRET_KEY is not configured",
+            success=False,
+            json_res=True,
         )
+    return Message(
+        status_code=status.HTTP_200_OK,
+        message="offline check-in snapshot key",
+        success=True,
+        data={"algorithm": "Ed25519", "public_key": snapshot_public_key()},
+    )
 
 
 @router.get("/verification-result", name="verification_result")
-def verification_result_page(
+async def verification_result_page(
     request: Request,
     current_user: CurrentUserDeps,
     message: str = None,
@@ -282,18 +532,226 @@ def verification_result_page(
     )
 
 
+@router.get("/{event_id}/check-in/snapshot", name="offline_snapshot")
+async def offline_snapshot(event_id: str, current_user: CurrentUserDeps) -> Response:
+    """
+    Signed snapshot of the invite codes and acceptance state of an event, for scanners checking guests in offline
+    """
+    if not signing_enabled():
+        raise HTTPMessageException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message="Offline check-in is unavailable, SECRET_KEY is not configured",
+            success=False,
+            json_res=True,
+        )
+    event_collection = get_async_collection(MONGO_COLLECTIONS.EVENTS)
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
+    if event_collection is None or invite_collection is None:
+        raise HTTPMessageException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message=collection_error_msg(
+                "offline_snapshot", MONGO_COLLECTIONS.INVITE.name
+            ),
+            success=False,
+            json_res=True,
+        )
+    if (
+        await event_collection.find_one(
+            {"_id": ObjectId(event_id), "created_by": current_user.id}, {"_id": 1}
+        )
+    ) is None:
+        raise HTTPMessageException(
+            message="Event does not exist",
+            status_code=status.HTTP_404_NOT_FOUND,
+            success=False,
+            json_res=True,
+        )
+
+    # taken before the invites are read, later changes are part of the next delta
+    built_at = datetime.now()
+    invites = await invite_collection.find(
+        {"event_invited_to": event_id},
+        {"_id": 0, "code": 1, "invite_accepted": 1},
+        batch_size=settings.EXPORT_BATCH_SIZE,
+    ).to_list(None)
+    snapshot = await run_in_threadpool(build_snapshot, event_id, invites, built_at)
+    return Response(
+        content=snapshot,
+        media_type="application/octet-stream",
+        headers={
+            "X-Snapshot-Version": str(to_version(built_at)),
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.post("/{event_id}/check-in/sync", name="offline_sync", response_model=Message)
+async def offline_sync(
+    event_id: str, sync_dto: SyncScansDto, current_user: CurrentUserDeps
+):
+    """
+    Upload the scans collected offline, returns the outcome of every scan and the invites changed since `since`
+    """
+    event_collection = get_async_collection(MONGO_COLLECTIONS.EVENTS)
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
+    if event_collection is None or invite_collection is None:
+        raise HTTPMessageException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message=collection_error_msg("offline_sync", MONGO_COLLECTIONS.INVITE.name),
+            success=False,
+            json_res=True,
+        )
+    if (
+        await event_collection.find_one(
+            {"_id": ObjectId(event_id), "created_by": current_user.id}, {"_id": 1}
+        )
+    ) is None:
+        raise HTTPMessageException(
+            message="Event does not exist",
+            status_code=status.HTTP_404_NOT_FOUND,
+            success=False,
+            json_res=True,
+        )
+
+    result = await sync_scans(invite_collection, event_id, sync_dto)
+    return Message(
+        status_code=status.HTTP_200_OK,
+        message=f"{len(result.results)} scan(s) synced",
+        success=True,
+        data=result.model_dump(),
+    )
+
+
+@router.websocket("/{event_id}/attendance/ws", name="attendance_ws")
+async def attendance_ws(websocket: WebSocket, event_id: str):
+    """
+    Live attendance of an event: the running totals on connect, then every check-in as it happens
+    """
+
+    async def reject(code: int):
+        # a handshake refused before `accept` reaches the browser as a 1006, not as `code`
+        await websocket.accept()
+        await websocket.close(code=code)
+
+    try:
+        current_user = await get_current_user(websocket.cookies.get("tk"))
+    except HTTPMessageException:
+        await reject(status.WS_1008_POLICY_VIOLATION)
+        return
+    event_collection = get_async_collection(MONGO_COLLECTIONS.EVENTS)
+    if event_collection is None:
+        await reject(status.WS_1011_INTERNAL_ERROR)
+        return
+    try:
+        event = await event_collection.find_one(
+            {"_id": ObjectId(event_id), "created_by": current_user.id}, {"_id": 1}
+        )
+    except InvalidId:
+        event = None
+    if event is None:
+        await reject(status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    queue = await attendance.subscribe(event_id)
+
+    async def forward_updates():
+        while True:
+            await websocket.send_json(await queue.get())
+
+    sender = None
+    try:
+        await websocket.send_json(
+            {"type": "totals", "totals": attendance.totals(event_id)}
+        )
+        sender = asyncio.create_task(forward_updates())
+        # the dashboard never sends anything, this only waits for it to disconnect
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if sender is not None:
+            sender.cancel()
+        attendance.unsubscribe(event_id, queue)
+
+
+@router.get("/{event_id}/export", name="export_invitations")
+async def export_invitations(
+    request: Request,
+    event_id: str,
+    current_user: CurrentUserDeps,
+    export_format: Annotated[ExportFormat, Query(alias="format")] = "csv",
+) -> StreamingResponse:
+    """
+    Stream the guest list of an event with its check-in times as CSV or NDJSON
+    """
+    event_collection = get_async_collection(MONGO_COLLECTIONS.EVENTS)
+    if event_collection is None:
+        raise HTTPMessageException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message=collection_error_msg(
+                "export_invitations", MONGO_COLLECTIONS.EVENTS.name
+            ),
+            success=False,
+        )
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
+    if invite_collection is None:
+        raise HTTPMessageException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message=collection_error_msg(
+                "export_invitations", MONGO_COLLECTIONS.INVITE.name
+            ),
+            success=False,
+        )
+    if (
+        await event_collection.find_one(
+            {"_id": ObjectId(event_id), "created_by": current_user.id}, {"_id": 1}
+        )
+    ) is None:
+        raise HTTPMessageException(
+            message="Event does not exist", status_code=status.HTTP_404_NOT_FOUND
+        )
+
+    invites = invite_collection.find(
+        {"event_invited_to": event_id},
+        {column: 1 for column in EXPORT_COLUMNS},
+        sort=[("_id", 1)],
+        batch_size=settings.EXPORT_BATCH_SIZE,
+    )
+    content = export_rows(invites, export_format)
+    headers = {
+        "Content-Disposition": f'attachment; filename="event-{event_id}-guests.{export_format}"',
+        "Vary": "Accept-Encoding",
+    }
+    # gzipped here at a cheaper level than `GZipMiddleware` (9), which passes responses with a `Content-Encoding` through
+    if "gzip" in accepted_encodings(request.headers.get("accept-encoding", "")):
+        content = gzip_chunks(content)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        content, media_type=MEDIA_TYPES[export_format], headers=headers
+    )
+
+
 @router.get("/{event_id}", name="single_event")
-def get_single_event(
-    request: Request, event_id: str, current_user: CurrentUserDeps
+async def get_single_event(
+    request: Request,
+    event_id: str,
+    current_user: CurrentUserDeps,
+    after: Optional[str] = None,
+    limit: PageSizeQuery = settings.LIST_PAGE_SIZE,
+    invite_status: Annotated[
+        Literal["all", "accepted", "pending"], Query(alias="status")
+    ] = "all",
 ) -> HTMLResponse:
-    event_collection = get_collection(MONGO_COLLECTIONS.EVENTS)
+    event_collection = get_async_collection(MONGO_COLLECTIONS.EVENTS)
     if event_collection is None:
         raise HTTPMessageException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             message=collection_error_msg("create_event", MONGO_COLLECTIONS.EVENTS.name),
             success=False,
         )
-    invite_collection = get_collection(MONGO_COLLECTIONS.INVITE)
+    invite_collection = get_async_collection(MONGO_COLLECTIONS.INVITE)
     if invite_collection is None:
         raise HTTPMessageException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -301,8 +759,12 @@ def get_single_event(
                 "get_single_event", MONGO_COLLECTIONS.INVITE.name
             ),
         )
+    if (response := await page_cache.respond(request, current_user.id)) is not None:
+        return response
+
+    stamp = await page_cache.stamp(event_scope(event_id))
     if (
-        event := event_collection.find_one(
+        event := await event_collection.find_one(
             {"_id": ObjectId(event_id), "created_by": current_user.id}
         )
     ) is None:
@@ -310,10 +772,29 @@ def get_single_event(
             message="Event does not exist", status_code=status.HTTP_404_NOT_FOUND
         )
 
-    event = EventModel(**event)
-    invites = invite_collection.find({"event_invited_to": event.id}).to_list(1000)
-    invite_coll = InviteCollection(invites=invites).model_dump()
-    context = {"event": event.model_dump(), "invites": invite_coll["invites"]}
-    return templates.TemplateResponse(
+    event = dump_trusted(EventModel, event)
+    invite_query = {"event_invited_to": event["id"]}
+    if invite_status != "all":
+        invite_query["invite_accepted"] = invite_status == "accepted"
+    # only the columns shown in the guest listing
+    invites, next_after = await find_page(
+        invite_collection,
+        invite_query,
+        projection={"email": 1, "fullname": 1, "delivery_status": 1},
+        after=after,
+        limit=limit,
+    )
+    context = {
+        "event": event,
+        "invites": [GuestListItem.from_document(invite) for invite in invites],
+        "invite_status": invite_status,
+        "after": after,
+        "next_after": next_after,
+        "limit": limit,
+    }
+    response = templates.TemplateResponse(
         request=request, name="event_details_page.html", context=context
     )
+    return await page_cache.store(
+        request, current_user.id, stamp, [event_scope(event["id"])], response
+    )
@@ -0,0 +1,220 @@
+"""
+    Background delivery of invitations.
+
+    Creating an invite only inserts the invite document with `delivery_status="pending"`, a pool of worker threads then claims pending invites from the `invites` collection and runs the delivery stages:
+    - store the QR code with `qr_storage`, an upload to cloudinary or a link to the on-demand image (skipped once `qr_code_img_url` is saved)
+    - send the invitation email
+
+    The queue is the collection itself, so pending deliveries survive restarts. A claim is a single `find_one_and_update` that moves `next_attempt_at` forward by the lease, which makes claims safe across workers and processes and hands invites held by a crashed worker back to the queue once the lease runs out. Failed attempts are retried with exponential backoff until `INVITE_DELIVERY_MAX_ATTEMPTS`.
+"""
+
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Any
+
+from bson import ObjectId
+from cachetools import TTLCache
+from pymongo import ReturnDocument
+
+from app.core import get_collection, MONGO_COLLECTIONS
+from app.core.config import settings
+from app.core.mailing import generate_event_invitation_email, send_email
+from app.core.page_cache import event_scope, page_cache
+from app.core.qr_storage import qr_storage
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    exponential backoff with jitter for the `attempts`-th failed attempt
+    """
+    delay = min(
+        settings.INVITE_DELIVERY_BACKOFF_SECONDS * 2 ** (attempts - 1),
+        settings.INVITE_DELIVERY_MAX_BACKOFF_SECONDS,
+    )
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class InviteDeliveryWorker:
+    """
+    pool of threads delivering pending invites
+    """
+
+    def __init__(self, workers: int = settings.INVITE_DELIVERY_WORKERS):
+        self.workers = workers
+        self._threads: list[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Condition()
+        self._pending_wakeups = 0
+        # event names and organiser emails, shared by every invite of an event
+        self._lookups: TTLCache = TTLCache(maxsize=1024, ttl=60)
+        self._lookups_lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"invite-delivery-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"started {self.workers} invite delivery worker(s)")
+
+    def stop(self) -> None:
+        """
+        stops claiming new invites and waits for in-flight deliveries to finish
+        """
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        deadline = datetime.now() + timedelta(
+            seconds=settings.INVITE_DELIVERY_SHUTDOWN_TIMEOUT_SECONDS
+        )
+        for thread in self._threads:
+            thread.join(max((deadline - datetime.now()).total_seconds(), 0))
+        if still_running := [
+            thread.name for thread in self._threads if thread.is_alive()
+        ]:
+            # their invites are picked up again once the lease expires
+            logger.warning(f"invite delivery did not drain in time: {still_running}")
+        self._threads = []
+
+    def notify(self, count: int = 1) -> None:
+        """
+        wakes idle workers for `count` newly queued invites instead of waiting for the next poll
+        """
+        with self._wakeup:
+            self._pending_wakeups += count
+            self._wakeup.notify(count)
+
+    def _wait_for_work(self) -> None:
+        with self._wakeup:
+            if self._pending_wakeups == 0 and not self._stopping.is_set():
+                self._wakeup.wait(settings.INVITE_DELIVERY_POLL_INTERVAL_SECONDS)
+            self._pending_wakeups = max(self._pending_wakeups - 1, 0)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                invite = self.claim()
+            except Exception as exc:
+                logger.error(f"failed to claim an invite for delivery: {exc}")
+                invite = None
+            if invite is None:
+                self._wait_for_work()
+                continue
+            self.deliver(invite)
+
+    def claim(self) -> dict[str, Any] | None:
+        invite_collection = get_collection(MONGO_COLLECTIONS.INVITE)
+        now = datetime.now()
+        return invite_collection.find_one_and_update(
+            {
+                # `processing` invites whose lease ran out belong to a worker that died
+                "delivery_status": {"$in": ["pending", "processing"]},
+                "next_attempt_at": {"$lte": now},
+            },
+            {
+                "$set": {
+                    "delivery_status": "processing",
+                    "next_attempt_at": now
+                    + timedelta(seconds=settings.INVITE_DELIVERY_LEASE_SECONDS),
+                },
+                "$inc": {"delivery_attempts": 1},
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _lookup(self, collection: MONGO_COLLECTIONS, _id: str, field: str) -> str:
+        key = (collection, _id)
+        with self._lookups_lock:
+            if (value := self._lookups.get(key)) is not None:
+                return value
+        document = get_collection(collection).find_one(
+            {"_id": ObjectId(_id)}, {field: 1}
+        )
+        if document is None:
+            raise LookupError(f"{collection.name} with id {_id} does not exist")
+        with self._lookups_lock:
+            self._lookups[key] = document[field]
+        return document[field]
+
+    def deliver(self, invite: dict[str, Any]) -> None:
+        invite_collection = get_collection(MONGO_COLLECTIONS.INVITE)
+        try:
+            if not invite.get("qr_code_img_url"):
+                stored = qr_storage.store(invite["code"], invite["verification_url"])
+                invite["qr_code_img_url"] = stored.url
+                # saved right away so a retry does not upload again
+                invite_collection.update_one(
+                    {"_id": invite["_id"]},
+                    {
+                        "$set": {
+                            "qr_code_img_url": stored.url,
+                            "qr_code_img_public_key": stored.public_id,
+                        }
+                    },
+                )
+
+            email_data = generate_event_invitation_email(
+                fullname=invite["fullname"],
+                qrcode_img_url=invite["qr_code_img_url"],
+                event_name=self._lookup(
+                    MONGO_COLLECTIONS.EVENTS, invite["event_invited_to"], "name"
+                ),
+                org_name="Organiser",
+                org_contact=self._lookup(
+                    MONGO_COLLECTIONS.USERS, invite["created_by"], "email"
+                ),
+            )
+            send_email(
+                email_to=invite["email"],
+                html_content=email_data.html_content,
+                subject=email_data.subject,
+            )
+        except Exception as exc:
+            self._failed(invite, exc)
+            return
+
+        invite_collection.update_one(
+            {"_id": invite["_id"]},
+            {
+                "$set": {
+                    "delivery_status": "delivered",
+                    "delivery_error": None,
+                    "next_attempt_at": None,
+                }
+            },
+        )
+        # the guest list shows the delivery status
+        page_cache.bump_sync(event_scope(invite["event_invited_to"]))
+
+    def _failed(self, invite: dict[str, Any], exc: Exception) -> None:
+        attempts = invite["delivery_attempts"]
+        error = exc.message if hasattr(exc, "message") else str(exc) or repr(exc)
+        if attempts >= settings.INVITE_DELIVERY_MAX_ATTEMPTS:
+            logger.error(
+                f"giving up on invite {invite['_id']} after {attempts} attempt(s): {error}"
+            )
+            update = {"delivery_status": "failed", "next_attempt_at": None}
+        else:
+            logger.warning(
+                f"delivery attempt {attempts} for invite {invite['_id']} failed: {error}"
+            )
+            update = {
+                "delivery_status": "pending",
+                "next_attempt_at": datetime.now() + retry_delay(attempts),
+            }
+        get_collection(MONGO_COLLECTIONS.INVITE).update_one(
+            {"_id": invite["_id"]}, {"$set": {**update, "delivery_error": error}}
+        )
+        page_cache.bump_sync(event_scope(invite["event_invited_to"]))
+
+
+invite_delivery = InviteDeliveryWorker()
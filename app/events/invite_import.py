@@ -0,0 +1,277 @@
+"""
+    Bulk guest-list (CSV) import.
+
+    Rows are streamed from the uploaded file and handled in batches of `settings.BULK_IMPORT_BATCH_SIZE`, for every batch:
+    - emails are de-duplicated in memory and against existing invites with a single query
+    - invites are written with one `insert_many` as pending deliveries
+
+    QR codes and invitation emails are then handled in parallel by the `invite_delivery` workers.
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import BinaryIO, Callable, Iterator, Literal, Optional
+
+from pydantic import BaseModel, ValidationError
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.invite_codes import new_invite_code
+from .events_models import CreateInviteModel, EventModel, InviteModel
+
+REQUIRED_COLUMNS = ("email", "fullname")
+
+
+class ImportRowResult(BaseModel):
+    """
+    outcome of a single CSV row
+    """
+
+    row: int
+    email: Optional[str] = None
+    status: Literal["invited", "skipped", "failed"]
+    message: str
+
+
+class ImportReport(BaseModel):
+    invited: int = 0
+    skipped: int = 0
+    failed: int = 0
+    rows: list[ImportRowResult] = []
+
+    def add(self, result: ImportRowResult) -> None:
+        setattr(self, result.status, getattr(self, result.status) + 1)
+        self.rows.append(result)
+
+
+class GuestListError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(message)
+
+
+def read_guest_rows(file: BinaryIO) -> Iterator[tuple[int, dict[str, str]]]:
+    """
+    validates the header of an uploaded CSV file and returns an iterator of `(row_number, row)` pairs, header names are case-insensitive
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise GuestListError("guest list is empty")
+    except (UnicodeDecodeError, csv.Error):
+        raise GuestListError("guest list must be a UTF-8 encoded CSV file")
+
+    header = [column.strip().lower() for column in header]
+    if missing := [column for column in REQUIRED_COLUMNS if column not in header]:
+        raise GuestListError(f"guest list is missing column(s): {', '.join(missing)}")
+
+    def rows():
+        try:
+            # row 1 is the header
+            for row_number, values in enumerate(reader, start=2):
+                if not any(value.strip() for value in values):
+                    continue
+                yield row_number, dict(zip(header, (value.strip() for value in values)))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise GuestListError(
+                f"guest list could not be read past row {reader.line_num}: {exc}"
+            )
+
+    return rows()
+
+
+def _import_batch(
+    batch: list[tuple[int, CreateInviteModel]],
+    *,
+    event: EventModel,
+    created_by: str,
+    invite_collection: Collection,
+    build_verify_url: Callable[[str], str],
+    report: ImportReport,
+):
+    emails = [invite_dto.email for _, invite_dto in batch]
+    already_invited = {
+        invite["email"]
+        for invite in invite_collection.find(
+            {"event_invited_to": event.id, "email": {"$in": emails}}, {"email": 1}
+        )
+    }
+
+    invites: list[tuple[int, InviteModel]] = []
+    queued_at = datetime.now()
+    for row_number, invite_dto in batch:
+        if invite_dto.email in already_invited:
+            report.add(
+                ImportRowResult(
+                    row=row_number,
+                    email=invite_dto.email,
+                    status="skipped",
+                    message="guest has already been invited to this event",
+                )
+            )
+            continue
+        code = new_invite_code(event.id)
+        invite = InviteModel(
+            email=invite_dto.email,
+            fullname=invite_dto.fullname,
+            event_invited_to=event.id,
+            code=code,
+            verification_url=build_verify_url(code),
+            delivery_status="pending",
+            next_attempt_at=queued_at,
+            created_by=created_by,
+        )
+        invites.append((row_number, invite))
+
+    if not invites:
+        return
+
+    failed_inserts: dict[int, dict] = {}
+    try:
+        invite_collection.insert_many(
+            [invite.model_dump(by_alias=True, exclude=["id"]) for _, invite in invites],
+            ordered=False,
+        )
+    except BulkWriteError as exc:
+        for error in exc.details.get("writeErrors", []):
+            failed_inserts[error["index"]] = error
+
+    for index, (row_number, invite) in enumerate(invites):
+        if (error := failed_inserts.get(index)) is not None and error.get(
+            "code"
+        ) == 11000:
+            # invited by someone else since the duplicate check
+            report.add(
+                ImportRowResult(
+                    row=row_number,
+                    email=invite.email,
+                    status="skipped",
+                    message="guest has already been invited to this event",
+                )
+            )
+            continue
+        if error is not None:
+            print(error.get("errmsg"))
+            report.add(
+                ImportRowResult(
+                    row=row_number,
+                    email=invite.email,
+                    status="failed",
+                    message="invite could not be saved",
+                )
+            )
+            continue
+        report.add(
+            ImportRowResult(
+                row=row_number,
+                email=invite.email,
+                status="invited",
+                message="invitation queued for delivery",
+            )
+        )
+
+
+def import_guest_list(
+    file: BinaryIO,
+    *,
+    event: EventModel,
+    created_by: str,
+    invite_collection: Collection,
+    build_verify_url: Callable[[str], str],
+) -> ImportReport:
+    """
+    invites every guest in a CSV guest list (`email`, `fullname` columns) to `event` and returns a per-row report
+    """
+    report = ImportReport()
+    seen_emails: set[str] = set()
+    batch: list[tuple[int, CreateInviteModel]] = []
+    rows_read = 0
+    last_row = 1
+
+    def flush():
+        _import_batch(
+            batch,
+            event=event,
+            created_by=created_by,
+            invite_collection=invite_collection,
+            build_verify_url=build_verify_url,
+            report=report,
+        )
+        batch.clear()
+
+    rows = read_guest_rows(file)
+    while True:
+        try:
+            row_number, row = next(rows)
+        except StopIteration:
+            break
+        except GuestListError as exc:
+            # keep the rows imported so far and report where reading stopped
+            report.add(
+                ImportRowResult(row=last_row + 1, status="failed", message=exc.message)
+            )
+            break
+
+        rows_read += 1
+        last_row = row_number
+        if rows_read > settings.BULK_IMPORT_MAX_ROWS:
+            report.add(
+                ImportRowResult(
+                    row=row_number,
+                    status="failed",
+                    message=f"guest list exceeds the limit of {settings.BULK_IMPORT_MAX_ROWS} rows, remaining rows were not imported",
+                )
+            )
+            break
+        try:
+            invite_dto = CreateInviteModel(
+                email=row.get("email", ""), fullname=row.get("fullname", "")
+            )
+        except ValidationError as exc:
+            report.add(
+                ImportRowResult(
+                    row=row_number,
+                    email=row.get("email") or None,
+                    status="failed",
+                    message="; ".join(
+                        f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                        for err in exc.errors()
+                    ),
+                )
+            )
+            continue
+        if not invite_dto.fullname:
+            report.add(
+                ImportRowResult(
+                    row=row_number,
+                    email=invite_dto.email,
+                    status="failed",
+                    message="fullname: Field required",
+                )
+            )
+            continue
+        if invite_dto.email in seen_emails:
+            report.add(
+                ImportRowResult(
+                    row=row_number,
+                    email=invite_dto.email,
+                    status="skipped",
+                    message="duplicate email in guest list",
+                )
+            )
+            continue
+        seen_emails.add(invite_dto.email)
+        batch.append((row_number, invite_dto))
+
+        if len(batch) >= settings.BULK_IMPORT_BATCH_SIZE:
+            flush()
+
+    if batch:
+        flush()
+
+    report.rows.sort(key=lambda result: result.row)
+    return report
@@ -0,0 +1,161 @@
+"""
+    Offline check-in for door scanners.
+
+    A scanner downloads a signed snapshot of an event's invites, validates scans locally while offline and later uploads the scans it collected with `sync_scans`.
+
+    Snapshot layout (big endian):
+    - `QRS1` magic (4 bytes)
+    - version (8 bytes), the time the snapshot was built in milliseconds since the epoch
+    - invite count `n` (4 bytes)
+    - hash size `h` (1 byte)
+    - `n` sorted code hashes of `h` bytes, the first `h` bytes of `sha256("{event_id}:{code}")`, looked up with a binary search
+    - acceptance bitmap of `ceil(n / 8)` bytes, bit `i % 8` (least significant first) of byte `i // 8` is set when invite `i` is accepted
+    - Ed25519 signature (64 bytes) of everything before it, verified with the key served by `snapshot_public_key`
+
+    Codes are not in the snapshot, a lost scanner does not leak them. With 6 byte hashes a 50k guest snapshot is about 300KB.
+
+    The signing key is derived from `SECRET_KEY`, snapshots are only served when it is configured (see `app.core.invite_codes.signing_enabled`): with its random per process default the key would change with every restart and differ between workers.
+"""
+
+import base64
+import hashlib
+import struct
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Optional
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from pydantic import BaseModel, Field, field_validator
+from pymongo.asynchronous.collection import AsyncCollection
+
+from app.core.config import settings
+from .checkin import MAX_BATCH_SCANS, CheckInResult, Scan, check_in_many, stored_time
+
+SNAPSHOT_MAGIC = b"QRS1"
+SNAPSHOT_HASH_SIZE = 6
+SNAPSHOT_HEADER = struct.Struct(">4sQIB")
+
+# a delta also repeats the changes of the few seconds before `since`, writes in flight while a
+# snapshot was built may carry a slightly earlier timestamp. Applying a change twice is harmless
+DELTA_OVERLAP = timedelta(seconds=5)
+# a `since` further ahead of the server clock is rejected
+MAX_CLOCK_SKEW = timedelta(days=1)
+
+
+@lru_cache
+def _signing_key() -> Ed25519PrivateKey:
+    # derived from `SECRET_KEY`, every app process signs with the same key once it is configured
+    seed = hashlib.sha256(f"offline-checkin:{settings.SECRET_KEY}".encode()).digest()
+    return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+def snapshot_public_key() -> str:
+    """
+    base64 encoded raw Ed25519 public key verifying snapshot signatures
+    """
+    raw = _signing_key().public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return base64.b64encode(raw).decode()
+
+
+def code_hash(event_id: str, code: str) -> bytes:
+    return hashlib.sha256(f"{event_id}:{code}".encode()).digest()[:SNAPSHOT_HASH_SIZE]
+
+
+def to_version(moment: datetime) -> int:
+    return int(moment.timestamp() * 1000)
+
+
+def from_version(version: int) -> datetime:
+    return datetime.fromtimestamp(version / 1000)
+
+
+def build_snapshot(
+    event_id: str, invites: list[dict[str, Any]], built_at: datetime
+) -> bytes:
+    """
+    packs and signs the `code`/`invite_accepted` pairs of `invites`, CPU bound so call it off the event loop
+    """
+    entries = sorted(
+        (code_hash(event_id, invite["code"]), bool(invite.get("invite_accepted")))
+        for invite in invites
+    )
+    bitmap = bytearray((len(entries) + 7) // 8)
+    for index, (_, accepted) in enumerate(entries):
+        if accepted:
+            bitmap[index // 8] |= 1 << (index % 8)
+
+    body = b"".join(
+        (
+            SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC, to_version(built_at), len(entries), SNAPSHOT_HASH_SIZE
+            ),
+            b"".join(code for code, _ in entries),
+            bytes(bitmap),
+        )
+    )
+    return body + _signing_key().sign(body)
+
+
+class SyncScansDto(BaseModel):
+    # version of the scanner's snapshot (or of its last sync)
+    since: int = Field(ge=0)
+    scans: list[Scan] = Field(default=[], max_length=MAX_BATCH_SCANS)
+
+    @field_validator("since")
+    @classmethod
+    def not_in_future(cls, since: int) -> int:
+        # `from_version` of a larger value overflows
+        if since > to_version(datetime.now() + MAX_CLOCK_SKEW):
+            raise ValueError("since is ahead of the server clock")
+        return since
+
+
+class DeltaEntry(BaseModel):
+    hash: str
+    invite_accepted: bool
+    invite_accepted_at: Optional[datetime] = None
+
+
+class SyncResult(BaseModel):
+    version: int
+    results: list[CheckInResult]
+    delta: list[DeltaEntry]
+
+
+async def sync_scans(
+    invite_collection: AsyncCollection, event_id: str, dto: SyncScansDto
+) -> SyncResult:
+    """
+    applies the scans collected offline and returns the invites created or checked in (`updated_at`) since `dto.since`
+
+    conflicts are resolved by the earliest scan (see `check_in_many`)
+    """
+    synced_at = stored_time(datetime.now())
+    results = await check_in_many(
+        invite_collection,
+        dto.scans,
+        {"event_invited_to": event_id},
+        synced_at,
+        event_id=event_id,
+    )
+
+    since = from_version(dto.since) - DELTA_OVERLAP
+    delta = [
+        DeltaEntry(
+            hash=code_hash(event_id, invite["code"]).hex(),
+            invite_accepted=invite.get("invite_accepted", False),
+            invite_accepted_at=invite.get("invite_accepted_at"),
+        )
+        async for invite in invite_collection.find(
+            {
+                "event_invited_to": event_id,
+                "$or": [
+                    {"created_at": {"$gt": since}},
+                    {"updated_at": {"$gt": since}},
+                ],
+            },
+            {"code": 1, "invite_accepted": 1, "invite_accepted_at": 1},
+        )
+    ]
+    return SyncResult(version=to_version(synced_at), results=results, delta=delta)
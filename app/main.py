@@ -1,30 +1,74 @@
 # import uvicorn
+import secrets
+import anyio.to_thread
 import arel
 from bson.errors import BSONError
 from fastapi import FastAPI, Request
-from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import (
     HTMLResponse,
     RedirectResponse,
     JSONResponse,
+    PlainTextResponse,
 )
 from starlette.middleware.cors import CORSMiddleware
-from pathlib import Path
 
 from app.auth import auth_routes
 from app.events import events_routes
+from app.events.invite_delivery import invite_delivery
+from app.events.attendance import attendance
+from app.events.event_stats import drain_event_stats, event_stats_reconciler
+from app.static_assets import (
+    BUILD_DIR,
+    STATIC_DIR,
+    AcceptAwareGZipMiddleware,
+    PrecompressedStaticFiles,
+    StaticAwareGZipMiddleware,
+    load_manifest,
+)
 from app.core import settings, templates
+from app.core.db import async_client
 from app.core.deps import IsUserAuthenticatedDeps
+from app.core.indexes import ensure_indexes
+from app.core.metrics import MetricsMiddleware, metrics_text, registry
+from app.core.password_hashing import password_hasher
+from app.core.rate_limit import rate_limit_stats
+from app.core.page_cache import page_cache
+from app.core.user_cache import user_cache
+from app.core.mailing import smtp_pool, reload_email_templates
+from app.core.template_manager import static_manifest
 from app.core.utils import HTTPMessageException, STATUS_CODE_TO_MESSAGE
 
 application = FastAPI()
 
+if settings.MONGO_ENSURE_INDEXES:
+    application.add_event_handler("startup", ensure_indexes)
+
+# bcrypt process pool, also tunes the bcrypt cost
+application.add_event_handler("startup", password_hasher.start)
+application.add_event_handler("shutdown", password_hasher.stop)
+
+# deliver pending invitations (QR code upload + email) in the background
+application.add_event_handler("startup", invite_delivery.start)
+application.add_event_handler("shutdown", invite_delivery.stop)
+# count the invites of events created before the guest counters, then repair drifted counters when an interval is configured
+application.add_event_handler("startup", event_stats_reconciler.start)
+application.add_event_handler("shutdown", event_stats_reconciler.stop)
+# counter increments of the last check-ins
+application.add_event_handler("shutdown", drain_event_stats)
+# after the delivery workers are done sending
+application.add_event_handler("shutdown", smtp_pool.close)
+application.add_event_handler("shutdown", async_client.close)
+
 
 async def reload_logger():
     print("Arel triggered server reload...")
 
 
+async def reload_mail_templates():
+    reload_email_templates()
+
+
 # Set all CORS enabled origins
 if settings.all_cors_origins:
     application.add_middleware(
@@ -38,7 +82,9 @@ if settings.all_cors_origins:
 # reload frontend on file change
 if _debug := settings.DEBUG:
     # tracks all files in directory for changes
-    hot_reload = arel.HotReload(paths=[arel.Path(".", on_reload=[reload_logger])])
+    hot_reload = arel.HotReload(
+        paths=[arel.Path(".", on_reload=[reload_logger, reload_mail_templates])]
+    )
     application.add_websocket_route("/hot-reload", route=hot_reload, name="hot-reload")
     application.add_event_handler("startup", hot_reload.startup)
     application.add_event_handler("shutdown", hot_reload.shutdown)
@@ -60,26 +106,68 @@ async def force_https_middleware(request: Request, call_next):
     return await call_next(request)
 
 
-static_dir = Path(__file__).parent.parent / "static"
-static_dir = str(static_dir)
-
-application.mount("/static", StaticFiles(directory=static_dir), name="static")
-
-# to serve compressed files
-application.add_middleware(GZipMiddleware)
+# the fingerprinted, precompressed build when there is one (`python -m app.static_assets build`), the sources while developing
+if not settings.DEBUG and (manifest := load_manifest()) is not None:
+    static_manifest.update(manifest)
+    application.mount(
+        "/static",
+        PrecompressedStaticFiles(directory=BUILD_DIR, manifest=manifest),
+        name="static",
+    )
+    # to serve compressed files, the static files are compressed already
+    application.add_middleware(StaticAwareGZipMiddleware, exclude_prefix="/static/")
+else:
+    application.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+    # to serve compressed files
+    application.add_middleware(AcceptAwareGZipMiddleware)
+# outermost, the request latency includes every other middleware
+application.add_middleware(MetricsMiddleware)
 
 # Include routers
 application.include_router(auth_routes.router)
 application.include_router(events_routes.router)
 
 
+def threadpool_stats() -> dict[str, int]:
+    # the threadpool running sync dependencies, `run_in_threadpool` and file responses
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "in_use": limiter.borrowed_tokens,
+        "size": limiter.total_tokens,
+        "waiting": limiter.statistics().tasks_waiting,
+    }
+
+
+registry.register_stats("threadpool", "Default worker threadpool", threadpool_stats)
+registry.register_stats("password_hash", "bcrypt process pool", password_hasher.stats)
+registry.register_stats("user_cache", "Authenticated user cache", user_cache.stats)
+registry.register_stats("page_cache", "Rendered page cache", page_cache.stats)
+registry.register_stats(
+    "rate_limit", "Rate limiters", rate_limit_stats, label="limiter"
+)
+registry.register_stats("attendance", "Live attendance dashboards", attendance.stats)
+
+
+@application.get("/metrics", name="metrics", include_in_schema=False)
+async def get_metrics(request: Request) -> PlainTextResponse:
+    if settings.METRICS_TOKEN is not None and not secrets.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise HTTPMessageException(
+            status_code=403, message="Invalid metrics token", json_res=True
+        )
+    return PlainTextResponse(
+        metrics_text(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @application.get("/", name="homepage")
-def get_homepage(request: Request) -> HTMLResponse:
+async def get_homepage(request: Request) -> HTMLResponse:
     return templates.TemplateResponse(request=request, name="homepage.html")
 
 
 @application.get("/forgot-password", name="forgot_password")
-def forgot_password_page(
+async def forgot_password_page(
     request: Request, email: str = None, reset_code: str = None
 ) -> HTMLResponse:
     context = {"reset_code": reset_code, "email": email}
@@ -89,7 +177,7 @@ def forgot_password_page(
 
 
 @application.get("/authentication", name="auth")
-def get_authentication_page(
+async def get_authentication_page(
     request: Request, redirect_url: IsUserAuthenticatedDeps
 ) -> HTMLResponse:
     if isinstance(redirect_url, RedirectResponse):
@@ -112,9 +200,13 @@ def get_authentication_page(
 
 
 @application.exception_handler(HTTPMessageException)
-def http_msg_exception_handler(request: Request, exc: HTTPMessageException):
+async def http_msg_exception_handler(request: Request, exc: HTTPMessageException):
     if exc.json_res:
-        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={"detail": exc.detail},
+            headers=exc.headers,
+        )
     title = STATUS_CODE_TO_MESSAGE.get(exc.status_code, None)
     context = {
         "title": title,
@@ -127,7 +219,7 @@ def http_msg_exception_handler(request: Request, exc: HTTPMessageException):
 
 
 @application.exception_handler(BSONError)
-def invalid_objectID_exception_handler(request: Request, exc: BSONError):
+async def invalid_objectID_exception_handler(request: Request, exc: BSONError):
     if len(exc.args) > 0 and isinstance(exc.args[0], str):
         msg = exc.args[0]
     return templates.TemplateResponse(
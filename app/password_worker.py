@@ -0,0 +1,32 @@
+"""
+    The bcrypt calls run in the `app.core.password_hashing` pool processes.
+
+    A pool process imports the module of the function it runs, this one only imports passlib: under `app.core` the package would load the settings and build the mongo clients (monitor threads, connection pools) in every bcrypt process.
+"""
+
+import time
+from functools import lru_cache
+
+from passlib.context import CryptContext
+
+# the schemes of `app.core.security.pwd_context`
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+@lru_cache
+def _bcrypt(rounds: int):
+    return pwd_context.handler("bcrypt").using(rounds=rounds)
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return _bcrypt(rounds).hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+def time_hash(rounds: int) -> float:
+    started = time.perf_counter()
+    hash_password("benchmark", rounds)
+    return time.perf_counter() - started
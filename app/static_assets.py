@@ -0,0 +1,218 @@
+"""
+    Fingerprinted, precompressed static files.
+
+    `python -m app.static_assets build` copies `static/` to `static-build/`:
+    - every file is renamed after its content hash (`css/tailwind-output.css` -> `css/tailwind-output.1a2b3c4d5e.css`), so it can be cached forever, a changed file gets a new url
+    - text files (css, js...) get `.gz` and, when the `brotli` package is installed, `.br` variants compressed once at their highest level
+    - `manifest.json` maps the source paths to the hashed ones, templates link files with `static_url('css/tailwind-output.css')` (see `app.core.template_manager`)
+
+    When `static-build/manifest.json` exists (and `settings.DEBUG` is off) `/static` serves the build with `PrecompressedStaticFiles`: the variant the client accepts, `Cache-Control: immutable` for hashed files, and no compression at request time. Otherwise `static/` is served as is.
+
+    Kept out of `app.core` so the build runs without the app settings (e.g. in the Docker build).
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional, `.gz` variants only
+    brotli = None
+
+STATIC_DIR = Path(__file__).parent.parent / "static"
+BUILD_DIR = Path(__file__).parent.parent / "static-build"
+MANIFEST_NAME = "manifest.json"
+
+# inputs of other build steps (`npm run tailwind:watch`), not served
+SOURCE_ONLY = {"css/tailwind-input.css"}
+COMPRESSIBLE = {".css", ".js", ".mjs", ".json", ".map", ".svg", ".txt", ".html"}
+HASH_LENGTH = 10
+
+# preferred first
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def hashed_name(path: str, content: bytes) -> str:
+    stem, suffix = os.path.splitext(path)
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return f"{stem}.{digest}{suffix}"
+
+
+def build(source: Path = STATIC_DIR, destination: Path = BUILD_DIR) -> dict[str, str]:
+    """
+    writes the hashed files, their compressed variants and the manifest to `destination` (replaced), returns the manifest
+    """
+    if destination.exists():
+        shutil.rmtree(destination)
+    manifest = {}
+    for file in sorted(source.rglob("*")):
+        path = file.relative_to(source).as_posix()
+        if not file.is_file() or path in SOURCE_ONLY:
+            continue
+        content = file.read_bytes()
+        manifest[path] = hashed_name(path, content)
+        target = destination / manifest[path]
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        if file.suffix not in COMPRESSIBLE:
+            continue
+        # a fixed mtime, the same input always builds the same file
+        Path(f"{target}.gz").write_bytes(gzip.compress(content, 9, mtime=0))
+        if brotli is not None:
+            Path(f"{target}.br").write_bytes(brotli.compress(content, quality=11))
+    (destination / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+
+def load_manifest(directory: Path = BUILD_DIR) -> Optional[dict[str, str]]:
+    """
+    the manifest of the build in `directory`, `None` when it was not built
+    """
+    try:
+        return json.loads((directory / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """
+    codings of an `Accept-Encoding` header, without the refused ones (`q=0`)
+    """
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0 and (coding := coding.strip().lower()):
+            accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(ENCODINGS)
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    serves a `build` output: the `.br`/`.gz` variant of a file when the client accepts it, hashed files with immutable cache headers
+    """
+
+    def __init__(self, *, directory: Path, manifest: dict[str, str]):
+        super().__init__(directory=directory)
+        self.immutable = {
+            os.path.realpath(directory / path) for path in manifest.values()
+        }
+        # the build does not change while it is served, its variants are found once
+        self.variants: dict[str, dict[str, tuple[str, os.stat_result]]] = {}
+        for full_path in self.immutable:
+            for encoding, suffix in ENCODINGS.items():
+                if os.path.isfile(variant := full_path + suffix):
+                    self.variants.setdefault(full_path, {})[encoding] = (
+                        variant,
+                        os.stat(variant),
+                    )
+
+    def file_response(
+        self,
+        full_path: os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = os.fspath(full_path)
+        headers = {
+            "Cache-Control": (IMMUTABLE if full_path in self.immutable else "no-cache"),
+            "Vary": "Accept-Encoding",
+        }
+        served_path = full_path
+        if variants := self.variants.get(full_path):
+            accepted = accepted_encodings(request_headers.get("Accept-Encoding", ""))
+            for encoding in ENCODINGS:
+                if encoding in variants and encoding in accepted:
+                    served_path, stat_result = variants[encoding]
+                    headers["Content-Encoding"] = encoding
+                    break
+
+        response = FileResponse(
+            served_path,
+            status_code=status_code,
+            headers=headers,
+            # the type of the file, not of its compressed variant
+            media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class AcceptAwareGZipMiddleware(GZipMiddleware):
+    """
+    `GZipMiddleware` honouring the `q` values of `Accept-Encoding`, `gzip;q=0` is not a request for gzip
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" not in accepted_encodings(
+            Headers(scope=scope).get("accept-encoding", "")
+        ):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class StaticAwareGZipMiddleware(AcceptAwareGZipMiddleware):
+    """
+    `AcceptAwareGZipMiddleware` skipping the paths under `exclude_prefix`, the precompressed files are never compressed again, not even the plain variant sent to clients that refuse them
+    """
+
+    def __init__(self, app: ASGIApp, *, exclude_prefix: str, **options):
+        super().__init__(app, **options)
+        self.exclude_prefix = exclude_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude_prefix):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="static files build")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--source", type=Path, default=STATIC_DIR)
+    parser.add_argument("--destination", type=Path, default=BUILD_DIR)
+    args = parser.parse_args()
+
+    manifest = build(args.source, args.destination)
+    print(
+        json.dumps(
+            {
+                "files": len(manifest),
+                "destination": str(args.destination),
+                "brotli": brotli is not None,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+    Microbenchmarks of the invite QR code pipeline, stage by stage:
+
+    - `matrix`: encoding the content into its module matrix (`qr_matrix`, mask scoring included unless `QR_MASK_PATTERN` is set)
+    - `pil_raster` / `pil_encode`: the PIL path, `make_image` then `image_to_bytes` (PNG), next to `image.tobytes()` (raw pixels) which its docstring compares it to
+    - `png`: `matrix_to_png`, rasterization and deflate in one pass (the path `create_n_upload_qrcode` takes)
+
+    Every stage is timed for each payload (the full `verify_invite_code` url and the bare code), error correction level and `box_size`, with the size of what it produced. `peak_kib` is the tracemalloc peak of building one image end to end, tracemalloc only sees allocations made through Python, so the pixel buffers PIL allocates itself are not part of the PIL peak (`raw_bytes` is their size).
+
+    python -m benchmarks.qr_pipeline [--rounds 50] [--box-sizes 4 10 20] [--error-correction L M Q H] [--json]
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable
+
+import qrcode
+
+from app.core import settings
+from app.core.cloudinary_uploader import image_to_bytes
+from app.core.invite_codes import new_invite_code
+from app.core.qr_render import ERROR_CORRECTION_LEVELS, matrix_to_png, qr_matrix
+
+CODE = new_invite_code("65f1c0de2b7e4a0012345678")
+PAYLOADS = {
+    "url": f"https://qrcode-event-manager.example.com/events/verify-invite/{CODE}",
+    "code": CODE,
+}
+
+
+def timed(func: Callable[[], Any], rounds: int) -> tuple[dict[str, float], Any]:
+    result = func()  # warm up
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "mean_ms": round(statistics.mean(timings) * 1000, 4),
+        "p95_ms": round(statistics.quantiles(timings, n=20)[-1] * 1000, 4),
+    }, result
+
+
+def peak_kib(func: Callable[[], Any]) -> float:
+    func()  # caches and lazy imports are not part of an image
+    tracemalloc.start()
+    try:
+        func()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def pil_qrcode(content: str, error_correction: str, box_size: int) -> qrcode.QRCode:
+    # `make_qrcode_with_content` with the level and box size as parameters
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=ERROR_CORRECTION_LEVELS[error_correction],
+        box_size=box_size,
+        border=settings.QR_BORDER,
+        mask_pattern=settings.QR_MASK_PATTERN,
+    )
+    qr.add_data(content)
+    qr.make(fit=True)
+    return qr
+
+
+def bench_case(
+    content: str, error_correction: str, box_size: int, rounds: int
+) -> dict[str, Any]:
+    border = settings.QR_BORDER
+    matrix_timing, matrix = timed(
+        lambda: qr_matrix(content, error_correction, settings.QR_MASK_PATTERN), rounds
+    )
+    qr = pil_qrcode(content, error_correction, box_size)
+    raster_timing, image = timed(qr.make_image, rounds)
+    encode_timing, pil_png = timed(lambda: image_to_bytes(image), rounds)
+    tobytes_timing, raw = timed(image.tobytes, rounds)
+    png_timing, png = timed(
+        lambda: matrix_to_png(matrix, box_size=box_size, border=border), rounds
+    )
+    return {
+        "modules": len(matrix),
+        "pixels": image.size[0],
+        "matrix": matrix_timing,
+        "pil_raster": raster_timing,
+        "pil_encode": encode_timing | {"bytes": len(pil_png)},
+        "pil_tobytes": tobytes_timing | {"raw_bytes": len(raw)},
+        "png": png_timing | {"bytes": len(png)},
+        "peak_kib": {
+            "pil": peak_kib(
+                lambda: image_to_bytes(
+                    pil_qrcode(content, error_correction, box_size).make_image()
+                )
+            ),
+            "png": peak_kib(
+                lambda: matrix_to_png(
+                    qr_matrix(content, error_correction, settings.QR_MASK_PATTERN),
+                    box_size=box_size,
+                    border=border,
+                )
+            ),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QR code pipeline microbenchmarks")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--box-sizes", type=int, nargs="+", default=[4, 10, 20])
+    parser.add_argument(
+        "--error-correction",
+        nargs="+",
+        choices=list(ERROR_CORRECTION_LEVELS),
+        default=list(ERROR_CORRECTION_LEVELS),
+    )
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        {"payload": payload, "error_correction": level, "box_size": box_size}
+        | bench_case(content, level, box_size, args.rounds)
+        for payload, content in PAYLOADS.items()
+        for level in args.error_correction
+        for box_size in args.box_sizes
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    columns = (
+        ("payload", 8, lambda r: r["payload"]),
+        ("ec", 3, lambda r: r["error_correction"]),
+        ("box", 4, lambda r: r["box_size"]),
+        ("modules", 8, lambda r: r["modules"]),
+        ("matrix ms", 10, lambda r: f"{r['matrix']['mean_ms']:.3f}"),
+        ("raster ms", 10, lambda r: f"{r['pil_raster']['mean_ms']:.3f}"),
+        ("encode ms", 10, lambda r: f"{r['pil_encode']['mean_ms']:.3f}"),
+        ("pil bytes", 10, lambda r: r["pil_encode"]["bytes"]),
+        ("tobytes ms", 11, lambda r: f"{r['pil_tobytes']['mean_ms']:.3f}"),
+        ("raw bytes", 10, lambda r: r["pil_tobytes"]["raw_bytes"]),
+        ("png ms", 8, lambda r: f"{r['png']['mean_ms']:.3f}"),
+        ("png bytes", 10, lambda r: r["png"]["bytes"]),
+        ("pil KiB", 8, lambda r: r["peak_kib"]["pil"]),
+        ("png KiB", 8, lambda r: r["peak_kib"]["png"]),
+    )
+    print("".join(f"{name:>{width}}" for name, width, _ in columns))
+    for result in results:
+        print("".join(f"{value(result):>{width}}" for _, width, value in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+    Compares the PIL QR code rendering (`make_qrcode_with_content` + `image_to_bytes`) with `app.core.qr_render`.
+
+    python -m benchmarks.qr_render [--rounds 200]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable
+
+from app.core.cloudinary_uploader import image_to_bytes, make_qrcode_with_content
+from app.core.qr_render import matrix_to_png, qr_matrix, render_qrcode
+
+CONTENT = (
+    "https://qrcode-event-manager.example.com/events/verify-invite/INVITE_3q2-7wEa1bQ"
+)
+
+
+def bench(render: Callable[[], bytes], rounds: int) -> dict[str, float]:
+    render()  # warm up
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        size = len(render())
+        timings.append(time.perf_counter() - start)
+    return {
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p95_ms": statistics.quantiles(timings, n=20)[-1] * 1000,
+        "bytes": size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QR code rendering benchmark")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    renderers = {
+        "pil (legacy)": lambda: image_to_bytes(make_qrcode_with_content(CONTENT)),
+        "png": lambda: render_qrcode(CONTENT, image_format="png"),
+        "svg": lambda: render_qrcode(CONTENT, image_format="svg"),
+        "png (mask 0)": lambda: matrix_to_png(
+            qr_matrix(CONTENT, mask_pattern=0), box_size=10, border=4
+        ),
+    }
+    print(f"{'renderer':<14}{'mean ms':>10}{'p95 ms':>10}{'bytes':>8}")
+    for name, render in renderers.items():
+        result = bench(render, args.rounds)
+        print(
+            f"{name:<14}{result['mean_ms']:>10.3f}{result['p95_ms']:>10.3f}{result['bytes']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
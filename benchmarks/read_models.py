@@ -0,0 +1,126 @@
+"""
+    Per-row cost of turning database documents into template context: validating them again through the pydantic models (what the pages did) against the read models of `app.events.events_models`.
+
+    python -m benchmarks.read_models [--rows 1000] [--rounds 20]
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from bson import ObjectId
+
+from app.events.events_models import (
+    EventListItem,
+    EventModel,
+    GuestListItem,
+    InviteCollection,
+    InviteModel,
+    dump_trusted,
+)
+
+
+def invite_documents(rows: int) -> list[dict[str, Any]]:
+    event_id, user_id = str(ObjectId()), str(ObjectId())
+    return [
+        {
+            "_id": ObjectId(),
+            "email": f"guest{index}@example.com",
+            "fullname": f"Guest {index}",
+            "event_invited_to": event_id,
+            "code": f"INV.code{index}",
+            "invite_accepted": index % 3 == 0,
+            "invite_accepted_at": datetime.now() if index % 3 == 0 else None,
+            "verification_url": f"https://example.com/events/verify-invite/INV.code{index}",
+            "qr_code_img_url": f"https://res.cloudinary.com/demo/image/upload/qr{index}.png",
+            "qr_code_img_public_key": f"qrcode_event_manager/qr{index}",
+            "delivery_status": "delivered",
+            "delivery_attempts": 1,
+            "created_by": user_id,
+            "created_at": datetime.now(),
+        }
+        for index in range(rows)
+    ]
+
+
+def event_documents(rows: int) -> list[dict[str, Any]]:
+    user_id = ObjectId()
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Event {index}",
+            "code": "abcdefg",
+            "description": "an event",
+            "start_date": datetime.now(),
+            "end_date": datetime.now() + timedelta(hours=4),
+            "is_active": True,
+            "invited_count": 100,
+            "accepted_count": 40,
+            "created_by": user_id,
+            "created_at": datetime.now(),
+        }
+        for index in range(rows)
+    ]
+
+
+def listed(documents: list[dict[str, Any]], fields: tuple[str, ...]):
+    # what `find_page` returns for the listing projection
+    return [
+        {"id": str(document["_id"])} | {field: document[field] for field in fields}
+        for document in documents
+    ]
+
+
+def per_row_us(convert: Callable[[], Any], rows: int, rounds: int) -> float:
+    convert()  # warm up
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        convert()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) / rows * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="read model benchmark")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    invites = invite_documents(args.rows)
+    events = event_documents(args.rows)
+    guest_rows = listed(invites, ("email", "fullname", "delivery_status"))
+    event_rows = listed(
+        events, ("name", "description", "invited_count", "accepted_count")
+    )
+
+    cases = {
+        "guest list": (
+            # the guest listing before it was projected and paginated
+            lambda: InviteCollection(invites=invites).model_dump(),
+            lambda: [GuestListItem.from_document(row) for row in guest_rows],
+        ),
+        "events list": (
+            lambda: [EventModel(**event).model_dump() for event in events],
+            lambda: [EventListItem.from_document(row) for row in event_rows],
+        ),
+        "invite details": (
+            lambda: [InviteModel(**invite).model_dump() for invite in invites],
+            lambda: [dump_trusted(InviteModel, invite) for invite in invites],
+        ),
+        "event details": (
+            lambda: [EventModel(**event).model_dump() for event in events],
+            lambda: [dump_trusted(EventModel, event) for event in events],
+        ),
+    }
+    print(f"{'rows':<16}{'pydantic us':>13}{'read model us':>15}{'speedup':>9}")
+    for name, (validated, trusted) in cases.items():
+        before = per_row_us(validated, args.rows, args.rounds)
+        after = per_row_us(trusted, args.rows, args.rounds)
+        print(f"{name:<16}{before:>13.2f}{after:>15.2f}{before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+    Local stand-ins for the services the app talks to, used by `benchmarks.e2e`:
+
+    - `Mongod`: a throwaway `mongod` (must be on `PATH`) with a user the app can authenticate as
+    - `FakeCloudinary`: answers Cloudinary uploads and deletes with canned responses
+    - `SMTPSink`: accepts (and counts) every mail, with `AUTH PLAIN`/`AUTH LOGIN` so the app's SMTP login succeeds
+"""
+
+import json
+import shutil
+import socket
+import socketserver
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Mongod:
+    def __init__(self, user: str = "bench", password: str = "bench"):
+        self.user = user
+        self.password = password
+        self.port = free_port()
+        self._dbpath: Optional[tempfile.TemporaryDirectory] = None
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 30) -> "Mongod":
+        from pymongo import MongoClient
+        from pymongo.errors import PyMongoError
+
+        if (mongod := shutil.which("mongod")) is None:
+            raise RuntimeError("mongod is not on PATH, pass --mongo-uri instead")
+        self._dbpath = tempfile.TemporaryDirectory(prefix="bench-mongod-")
+        self._process = subprocess.Popen(
+            [
+                mongod,
+                "--dbpath",
+                self._dbpath.name,
+                "--port",
+                str(self.port),
+                "--bind_ip",
+                "127.0.0.1",
+                "--quiet",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        client = MongoClient(self.host, serverSelectionTimeoutMS=500)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                client.admin.command("ping")
+                break
+            except PyMongoError:
+                if time.monotonic() > deadline or self._process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("mongod did not start")
+                time.sleep(0.2)
+        # the app always connects with credentials
+        client.admin.command("createUser", self.user, pwd=self.password, roles=["root"])
+        client.close()
+        return self
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait(timeout=30)
+            self._process = None
+        if self._dbpath is not None:
+            self._dbpath.cleanup()
+            self._dbpath = None
+
+
+class _CloudinaryHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/destroy"):
+            body = {"result": "ok"}
+        else:
+            self.server.uploads += 1
+            public_id = f"qrcode_event_manager/{uuid.uuid4().hex}"
+            url = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}/{public_id}.png"
+            body = {
+                "access_mode": "public",
+                "api_key": "0",
+                "asset_id": uuid.uuid4().hex,
+                "bytes": 1024,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "etag": uuid.uuid4().hex,
+                "folder": "qrcode_event_manager",
+                "format": "png",
+                "height": 290,
+                "original_filename": "file",
+                "placeholder": False,
+                "public_id": public_id,
+                "resource_type": "image",
+                "secure_url": url,
+                "signature": uuid.uuid4().hex,
+                "tags": [],
+                "type": "upload",
+                "url": url,
+                "version": 1,
+                "version_id": uuid.uuid4().hex,
+                "width": 290,
+            }
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCloudinary:
+    """
+    point the SDK at it with `cloudinary.config(upload_prefix=fake.url)`
+    """
+
+    def __init__(self):
+        self._server = ThreadingHTTPServer(
+            ("127.0.0.1", free_port()), _CloudinaryHandler
+        )
+        self._server.daemon_threads = True
+        self._server.uploads = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def uploads(self) -> int:
+        return self._server.uploads
+
+    def start(self) -> "FakeCloudinary":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 bench SMTP sink")
+        while line := self.rfile.readline():
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(
+                    b"250-bench\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n"
+                )
+            elif verb == "AUTH":
+                if command.upper().startswith("AUTH LOGIN"):
+                    # username and password prompts
+                    for _ in range(2 - len(command.split()[2:])):
+                        self.reply("334 ")
+                        self.rfile.readline()
+                self.reply("235 accepted")
+            elif verb == "DATA":
+                self.reply("354 end with <CRLF>.<CRLF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.messages += 1
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self.reply("250 ok")
+
+
+class SMTPSink:
+    def __init__(self):
+        self._server = socketserver.ThreadingTCPServer(
+            ("127.0.0.1", free_port()), _SMTPHandler
+        )
+        self._server.daemon_threads = True
+        self._server.messages = 0
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def messages(self) -> int:
+        return self._server.messages
+
+    def start(self) -> "SMTPSink":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,81 @@
+/**
+ * @typedef {Object} AttendanceTotals
+ * @property {number} invited
+ * @property {number} accepted
+ */
+
+/**
+ * @typedef {Object} AttendanceGuest
+ * @property {string | null} fullname
+ * @property {string | null} invite_accepted_at
+ */
+
+/**
+ * @typedef {Object} AttendanceUpdate
+ * @property {"totals" | "invited" | "check_in"} type
+ * @property {AttendanceTotals | null} totals
+ * @property {AttendanceGuest[] | undefined} guests
+ */
+
+const MAX_RECENT_CHECK_INS = 50;
+const RECONNECT_DELAY_MS = 3000;
+// not signed in or not the organiser of the event, retrying will not help
+const POLICY_VIOLATION = 1008;
+
+/**
+ * Follow the live attendance of the event whose dashboard is open
+ *
+ * @param {HTMLElement} container
+ */
+function watchAttendance(container) {
+  const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+  const socket = new WebSocket(
+    `${protocol}//${window.location.host}${container.dataset.url}`
+  );
+
+  /**@type {HTMLElement} */
+  const invited = container.querySelector("[data-invited]"),
+    accepted = container.querySelector("[data-accepted]"),
+    recent = container.querySelector("[data-recent]"),
+    state = container.querySelector("[data-state]");
+
+  socket.addEventListener("open", () => {
+    state.textContent = "live";
+  });
+
+  socket.addEventListener("message", (event) => {
+    /**@type {AttendanceUpdate} */
+    const update = JSON.parse(event.data);
+    if (update.totals) {
+      invited.textContent = update.totals.invited;
+      accepted.textContent = update.totals.accepted;
+    }
+    for (const guest of update.guests || []) {
+      const item = document.createElement("li");
+      const time = guest.invite_accepted_at
+        ? new Date(guest.invite_accepted_at).toLocaleTimeString()
+        : "";
+      item.textContent = `${time} - ${guest.fullname || "Unknown guest"}`;
+      recent.prepend(item);
+    }
+    while (recent.children.length > MAX_RECENT_CHECK_INS) {
+      recent.lastElementChild.remove();
+    }
+  });
+
+  socket.addEventListener("close", (event) => {
+    if (event.code === POLICY_VIOLATION) {
+      state.textContent = "unavailable";
+      return;
+    }
+    state.textContent = "reconnecting...";
+    setTimeout(() => watchAttendance(container), RECONNECT_DELAY_MS);
+  });
+}
+
+(function () {
+  const container = document.getElementById("liveAttendance");
+  if (container) {
+    watchAttendance(container);
+  }
+})();
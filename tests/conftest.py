@@ -0,0 +1,19 @@
+import os
+
+# the settings the app needs to be imported, the tests do not connect to anything
+for name, value in {
+    "MONGO_USER": "test",
+    "MONGO_PASSWORD": "test",
+    "MONGO_HOST": "localhost:27017",
+    "MONGO_QUERY": "",
+    "MONGO_SCHEME": "mongodb",
+    "DEBUG": "false",
+    "DATABASE_NAME": "test",
+    "CLOUDINARY_CLOUD_NAME": "test",
+    "CLOUDINARY_API_KEY": "1",
+    "CLOUDINARY_API_SECRET": "test",
+    "SMTP_USER_EMAIL": "test@example.com",
+    "SMTP_PASSWORD": "test",
+    "EMAILS_FROM_EMAIL": "test@example.com",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,97 @@
+import pytest
+
+from app.core import invite_codes
+from app.core.config import settings
+from app.core.invite_codes import (
+    LEGACY_PREFIX,
+    invite_code_event,
+    is_valid_invite_code,
+    new_invite_code,
+)
+
+EVENT_ID = "65f1c0de2b7e4a0012345678"
+OTHER_EVENT_ID = "65f1c0de2b7e4a0087654321"
+
+
+@pytest.fixture(autouse=True)
+def signing(monkeypatch):
+    monkeypatch.setattr(invite_codes, "signing_enabled", lambda: True)
+
+
+def test_signed_code_round_trip():
+    code = new_invite_code(EVENT_ID)
+    assert code.startswith("INV.")
+    assert invite_code_event(code) == EVENT_ID
+    assert is_valid_invite_code(code)
+    assert is_valid_invite_code(code, EVENT_ID)
+
+
+def test_codes_are_unique():
+    assert new_invite_code(EVENT_ID) != new_invite_code(EVENT_ID)
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "",
+        "INV",
+        "INV...",
+        "INV.a.b",
+        "INV.a.b.c.d",
+        "XYZ.a.b.c",
+        "INV.a.b.é",
+        "INV.é.b.c",
+        "INV.a.b.c\n",
+        "INV.a.b.c=",
+        "INV.a+b.c.d",
+        "INV.a.b.\x00",
+        "not a code",
+        "🎟️",
+    ],
+)
+def test_garbage_is_rejected(code):
+    assert invite_code_event(code) is None
+    assert not is_valid_invite_code(code)
+    assert not is_valid_invite_code(code, EVENT_ID)
+
+
+def test_tampered_mac_is_rejected():
+    prefix, event, nonce, mac = new_invite_code(EVENT_ID).split(".")
+    tampered = "A" if mac[0] != "A" else "B"
+    assert invite_code_event(f"{prefix}.{event}.{nonce}.{tampered}{mac[1:]}") is None
+    assert invite_code_event(f"{prefix}.{event}.{nonce}.{mac[:-1]}") is None
+
+
+def test_tampered_payload_is_rejected():
+    prefix, event, nonce, mac = new_invite_code(EVENT_ID).split(".")
+    other_event = new_invite_code(OTHER_EVENT_ID).split(".")[1]
+    assert invite_code_event(f"{prefix}.{other_event}.{nonce}.{mac}") is None
+    assert invite_code_event(f"{prefix}.{event}.{nonce}x.{mac}") is None
+
+
+def test_code_of_another_event_is_rejected():
+    code = new_invite_code(OTHER_EVENT_ID)
+    assert is_valid_invite_code(code)
+    assert not is_valid_invite_code(code, EVENT_ID)
+
+
+@pytest.mark.parametrize("accept_legacy", [True, False])
+def test_legacy_codes(monkeypatch, accept_legacy):
+    monkeypatch.setattr(settings, "ACCEPT_LEGACY_INVITE_CODES", accept_legacy)
+    code = f"{LEGACY_PREFIX}abcdefghijk"
+    assert invite_code_event(code) is None
+    assert is_valid_invite_code(code) is accept_legacy
+    assert is_valid_invite_code(code, EVENT_ID) is accept_legacy
+
+
+def test_unsigned_without_a_configured_key(monkeypatch):
+    signed = new_invite_code(EVENT_ID)
+    monkeypatch.setattr(invite_codes, "signing_enabled", lambda: False)
+    monkeypatch.setattr(settings, "ACCEPT_LEGACY_INVITE_CODES", False)
+
+    code = new_invite_code(EVENT_ID)
+    assert code.startswith(LEGACY_PREFIX)
+    # the codes it creates, and the signed ones it cannot check, are looked up
+    assert is_valid_invite_code(code, EVENT_ID)
+    assert is_valid_invite_code(signed, OTHER_EVENT_ID)
+    assert not is_valid_invite_code("garbage")
@@ -0,0 +1,91 @@
+import asyncio
+import socket
+
+import pytest
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+from app.core import mailing
+from app.core.mailing import SMTPConnectionPool
+
+
+class Sink:
+    def __init__(self):
+        self.messages: list[tuple[object, list[str]]] = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session, envelope.rcpt_tos))
+        return "250 OK"
+
+    @property
+    def connections(self) -> int:
+        return len({id(session) for session, _ in self.messages})
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    handler = Sink()
+    controller = aiosmtpd_controller.Controller(
+        handler, hostname="127.0.0.1", port=free_port()
+    )
+    controller.start()
+    monkeypatch.setattr(
+        SMTPConnectionPool,
+        "smtp_options",
+        staticmethod(
+            lambda: {"host": "127.0.0.1", "port": controller.port, "timeout": 5}
+        ),
+    )
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = SMTPConnectionPool(size=1, max_messages=2, keepalive=30, timeout=5)
+    monkeypatch.setattr(mailing, "smtp_pool", pool)
+    yield pool
+    pool.close()
+
+
+def test_mails_reuse_the_pooled_connection(sink, pool):
+    pool.max_messages = 100
+    for index in range(3):
+        mailing.send_email(
+            email_to=f"guest{index}@example.com", subject="hi", html_content="<p>hi</p>"
+        )
+    assert [rcpt for _, rcpt in sink.messages] == [
+        [f"guest{index}@example.com"] for index in range(3)
+    ]
+    assert sink.connections == 1
+
+
+def test_connection_is_recycled_after_max_messages(sink, pool):
+    for index in range(5):
+        mailing.send_email(
+            email_to=f"guest{index}@example.com", subject="hi", html_content="<p>hi</p>"
+        )
+    assert len(sink.messages) == 5
+    assert sink.connections == 3
+
+
+def test_async_mails_share_the_pool(sink, pool):
+    async def send_all():
+        await asyncio.gather(
+            *(
+                mailing.send_email_async(
+                    email_to=f"guest{index}@example.com", html_content="<p>hi</p>"
+                )
+                for index in range(4)
+            )
+        )
+
+    asyncio.run(send_all())
+    assert len(sink.messages) == 4
+    assert sink.connections == 2